@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -10,9 +11,50 @@ DB_NAME = "database.db"
 def create_app():
     app = Flask(__name__)
     app.config["SECRET_KEY"] = "J7FhNA8hx0qcDFDBDITpcldGIx8QXKlm"
-    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # Maximum file size: 16 MB
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_NAME}"
+    app.config["MAX_CONTENT_LENGTH"] = 4 * 1024**3  # Maximum file size: 4 GB
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "DATABASE_URL", f"sqlite:///{DB_NAME}"
+    )
+    app.config["DATABASE_POOL_SIZE"] = 10  # Connections kept open for reuse
+    app.config["DATABASE_MAX_OVERFLOW"] = 10  # Extra connections under load
+    app.config["DATABASE_POOL_TIMEOUT"] = 30  # Seconds to wait for a connection
+    app.config["SQLITE_JOURNAL_MODE"] = "wal"  # Readers do not block on a writer
+    app.config["SQLITE_SYNCHRONOUS"] = "normal"
+    app.config["SQLITE_CACHE_SIZE"] = -64 * 1024  # Negative values are KiB
+    app.config["SQLITE_MMAP_SIZE"] = 256 * 1024**2
+    app.config["SQLITE_BUSY_TIMEOUT"] = 5000  # Milliseconds to wait for a lock
+    app.config["INGEST_BATCH_SIZE"] = 5000  # Rows per executemany batch
+    app.config["VIEW_ENGINE"] = "sql"  # "sql" or "memory" (NumPy sort/group)
+    app.config["VIEW_CACHE_MAX_BYTES"] = 64 * 1024 * 1024
+    app.config["STORAGE_BACKEND"] = "sql"  # "sql" rows or "columnar" files
+    app.config["COLUMNAR_STORAGE_PATH"] = os.path.join(app.instance_path, "columnar")
+    app.config["UPLOAD_WORKERS"] = 2  # Background ingest threads, 0 = synchronous
+    app.config["UPLOAD_SPOOL_PATH"] = os.path.join(app.instance_path, "uploads")
+    app.config["UPLOAD_PART_MAX_BYTES"] = 64 * 1024 * 1024  # Per resumable part
+    app.config["PARSE_WORKERS"] = 0  # Parser processes, 0 = one per core
+    app.config["PARSE_CHUNK_BYTES"] = 8 * 1024 * 1024
+    app.config["PARALLEL_PARSE_MIN_BYTES"] = 128 * 1024 * 1024
+    app.config["API_TOKEN_MAX_AGE"] = 24 * 3600  # Seconds an API token stays valid
+    app.config["USER_CACHE_TTL"] = 60  # Seconds a loaded user is reused, 0 = off
+    app.config["INSTRUMENTATION"] = False  # Server-Timing headers and /metrics
+    app.config["PROFILE_SAMPLE_RATE"] = 0.0  # Share of requests run under cProfile
+    app.config["PROFILE_PATH"] = os.path.join(app.instance_path, "profiles")
+    app.config.from_prefixed_env()
+
+    from .src.engine import configure_engine, engine_options
+
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
     db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+
+    from .src.cache import view_cache
+
+    view_cache.init_app(app)
+
+    from .src.metrics import instrumentation
+
+    instrumentation.init_app(app)
 
     from .src.homepage import homepage
     from .src.api import api
@@ -22,10 +64,20 @@ def create_app():
     app.register_blueprint(api, url_prefix="/")
     app.register_blueprint(authentication, url_prefix="/")
 
-    from .src.database import User
+    from .src.auth import token_signer, user_cache
+    from .src.jobs import upload_queue
+    from .src.migrations import upgrade_database
+    from .src.parsepool import parse_pool
+
+    upload_queue.init_app(app)
+    parse_pool.init_app(app)
+    user_cache.init_app(app)
+    token_signer.init_app(app)
 
     with app.app_context():
         db.create_all()
+        upgrade_database()
+        upload_queue.recover()
 
     login_manager = LoginManager()
     login_manager.login_view = "authentication.login"
@@ -33,6 +85,6 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(id):
-        return User.query.get(int(id))
+        return user_cache.get(int(id))
 
     return app
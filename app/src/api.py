@@ -1,12 +1,57 @@
+import itertools
+import os
 from flask import (
     Blueprint,
+    Response,
+    current_app,
+    g,
     jsonify,
     request,
+    send_file,
+    stream_with_context,
+)
+from flask_login import current_user
+from werkzeug.utils import secure_filename
+from .auth import token_signer
+from .database import File, Setting, UploadJob, UploadSession
+from .export import (
+    EXPORT_FORMATS,
+    export_batches,
+    export_columnar,
+    stream_temporary_file,
+)
+from .jobs import job_status, upload_queue
+from .merge import MERGED_COLUMNS, batched, merge_views
+from .region import Region, parse_region
+from .resumable import (
+    complete_upload,
+    ingest_part,
+    open_upload,
+    upload_status,
+    validate_upload_target,
+)
+from .stream import (
+    MAX_PAGE_ROWS,
+    ROW_FORMATS,
+    STREAM_BATCH_SIZE,
+    RowPager,
+    decode_cursor,
+    format_rows,
+)
+from .summary import (
+    SUMMARY_GROUPS,
+    compute_group_stats,
+    read_file_summary,
+    summary_records,
 )
 from .util import (
-    validate_existing_user,
-    validate_fileString,
+    split_compression,
+    validate_api_user,
+    validate_compression,
+    validate_filename,
+    validate_fileStream,
     validate_new_user,
+    validate_view_setting,
 )
 
 api: Blueprint = Blueprint("api", __name__)
@@ -23,16 +68,323 @@ def sign_up():
     return jsonify({"success": "Account created"}), 201
 
 
+@api.route("/api/token", methods=["POST"])
+def issue_token():
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    token = token_signer.issue(current_user)
+    return jsonify({"token": token, "expires_in": token_signer.max_age}), 201
+
+
 @api.route("/api/upload", methods=["POST"])
 def upload_file():
-    auth = request.authorization
-    existing_user_validation = validate_existing_user(auth.username, auth.password)
-    if existing_user_validation != "":
-        return jsonify({"error": existing_user_validation}), 400
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
 
-    file_string = request.data.decode("utf-8")
     filename = request.headers.get("filename")
-    file_validation = validate_fileString(file_string, filename)
-    if file_validation != "":
+    content_encoding = request.headers.get("Content-Encoding")
+    append = request.headers.get("append", "").lower() in ("1", "true", "yes")
+    if upload_queue.is_async:
+        filename = secure_filename(filename or "")
+        filename_validation = validate_filename(filename)
+        if filename_validation != "":
+            return jsonify({"error": filename_validation}), 400
+        compression_validation = validate_compression(
+            split_compression(filename, content_encoding)[1]
+        )
+        if compression_validation != "":
+            return jsonify({"error": compression_validation}), 400
+        job = upload_queue.enqueue(
+            request.stream, filename, current_user, content_encoding, append
+        )
+        return jsonify({"message": "File upload queued", **job_status(job)}), 202
+
+    with upload_queue.spool(request.stream) as spool:
+        file_validation = validate_fileStream(
+            spool, filename, content_encoding, append
+        )
+    if file_validation != "ok":
         return jsonify({"error": file_validation}), 400
-    return jsonify({"message": "File uploaded successfully"}), 201
+    message = "Rows appended successfully" if append else "File uploaded successfully"
+    return jsonify({"message": message, **g.ingest_stats}), 201
+
+
+@api.route("/api/uploads", methods=["POST"])
+def start_upload():
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    filename = secure_filename(request.headers.get("filename") or "")
+    content_encoding = request.headers.get("Content-Encoding")
+    append = request.headers.get("append", "").lower() in ("1", "true", "yes")
+    filename_validation = validate_filename(filename)
+    if filename_validation != "":
+        return jsonify({"error": filename_validation}), 400
+    compression_validation = validate_compression(
+        split_compression(filename, content_encoding)[1]
+    )
+    if compression_validation != "":
+        return jsonify({"error": compression_validation}), 400
+    target_validation = validate_upload_target(filename, append, current_user)
+    if target_validation != "":
+        return jsonify({"error": target_validation}), 400
+    upload = open_upload(filename, current_user, content_encoding, append)
+    return jsonify(upload_status(upload)), 201
+
+
+@api.route("/api/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    upload = UploadSession.query.filter_by(
+        id=upload_id, user_id=current_user.id
+    ).first()
+    if upload is None:
+        return jsonify({"error": f"Upload {upload_id} not found"}), 404
+    return jsonify(upload_status(upload)), 200
+
+
+@api.route("/api/uploads/<upload_id>/parts/<int:part_number>", methods=["PUT"])
+def put_upload_part(upload_id, part_number):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    upload = UploadSession.query.filter_by(
+        id=upload_id, user_id=current_user.id
+    ).first()
+    if upload is None:
+        return jsonify({"error": f"Upload {upload_id} not found"}), 404
+    max_bytes = current_app.config["UPLOAD_PART_MAX_BYTES"]
+    data = request.stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return jsonify({"error": f"Parts are limited to {max_bytes} bytes"}), 413
+    part_validation = ingest_part(upload, part_number, data)
+    if part_validation != "ok":
+        return jsonify({"error": part_validation, **upload_status(upload)}), 400
+    return jsonify(upload_status(upload)), 200
+
+
+@api.route("/api/uploads/<upload_id>/complete", methods=["POST"])
+def complete_upload_parts(upload_id):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    upload = UploadSession.query.filter_by(
+        id=upload_id, user_id=current_user.id
+    ).first()
+    if upload is None:
+        return jsonify({"error": f"Upload {upload_id} not found"}), 404
+    upload_validation = complete_upload(upload, current_user)
+    if upload_validation != "ok":
+        return jsonify({"error": upload_validation, **upload_status(upload)}), 400
+    if "upload_job" in g:
+        job = g.upload_job
+        return jsonify({"message": "File upload queued", **job_status(job)}), 202
+    message = (
+        "Rows appended successfully"
+        if upload.append
+        else "File uploaded successfully"
+    )
+    return jsonify({"message": message, **upload_status(upload)}), 201
+
+
+@api.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    jobs = UploadJob.query.filter_by(user_id=current_user.id).order_by(
+        UploadJob.date.desc()
+    )
+    return jsonify([job_status(job) for job in jobs]), 200
+
+
+@api.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    job = UploadJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job_status(job)), 200
+
+
+@api.route("/api/files/<filename>/rows", methods=["GET"])
+def file_rows(filename):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    file = File.query.filter_by(user_id=current_user.id, filename=filename).first()
+    if file is None:
+        return jsonify({"error": f"{filename} not found"}), 404
+
+    sort_by = request.args.get("sort_by", "---")
+    group_by = request.args.get("group_by", "---")
+    show_top = request.args.get("show_top", type=int)
+    setting_validation = validate_view_setting(sort_by, group_by, show_top)
+    if setting_validation != "":
+        return jsonify({"error": setting_validation}), 400
+    row_format = request.args.get("format", "ndjson")
+    if row_format not in ROW_FORMATS:
+        return jsonify({"error": f"Invalid format: {row_format}"}), 400
+    limit = request.args.get("limit", type=int)
+    if limit is not None and not 0 < limit <= MAX_PAGE_ROWS:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_ROWS}"}), 400
+
+    try:
+        regions = request_regions()
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    pager = RowPager(file, sort_by, group_by, show_top, regions)
+    try:
+        cursor = decode_cursor(request.args.get("cursor"))
+        pager.check_cursor(cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    headers = {}
+    if limit is None:
+        batches = pager.batches(cursor)
+    else:
+        rows, next_cursor = pager.page(cursor, limit)
+        batches = [rows]
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = next_cursor
+    return Response(
+        stream_with_context(format_rows(batches, row_format)),
+        mimetype=ROW_FORMATS[row_format],
+        headers=headers,
+    )
+
+
+@api.route("/api/files/<filename>/export", methods=["GET"])
+def export_file(filename):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    file = File.query.filter_by(user_id=current_user.id, filename=filename).first()
+    if file is None:
+        return jsonify({"error": f"{filename} not found"}), 404
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format: {export_format}"}), 400
+
+    sort_by = request.args.get("sort_by", "---")
+    group_by = request.args.get("group_by", "---")
+    show_top = request.args.get("show_top", type=int)
+    if request.args.get("setting", "").lower() in ("1", "true", "yes"):
+        setting = Setting.query.filter_by(file_id=file.id).first()
+        if setting is None:
+            return jsonify({"error": f"{filename} has no saved setting"}), 404
+        sort_by, group_by = setting.sort_by, setting.group_by
+        show_top = int(setting.show_top)
+    setting_validation = validate_view_setting(sort_by, group_by, show_top)
+    if setting_validation != "":
+        return jsonify({"error": setting_validation}), 400
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    download_name = f"{filename.rsplit('.', 1)[0]}.{extension}"
+    headers = {"Content-Disposition": f"attachment; filename={download_name}"}
+    if export_format == "columnar":
+        path, is_temporary = export_columnar(file, sort_by, group_by, show_top)
+        if not is_temporary:
+            return send_file(
+                path, mimetype, as_attachment=True, download_name=download_name
+            )
+        headers["Content-Length"] = str(os.path.getsize(path))
+        return Response(stream_temporary_file(path), mimetype=mimetype, headers=headers)
+    batches = export_batches(file, sort_by, group_by, show_top)
+    return Response(
+        stream_with_context(format_rows(batches, export_format)),
+        mimetype=mimetype,
+        headers=headers,
+    )
+
+
+@api.route("/api/merge", methods=["GET"])
+def merged_rows():
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    filenames = [
+        name for name in dict.fromkeys(request.args.get("files", "").split(",")) if name
+    ]
+    if not filenames:
+        return jsonify({"error": "No files to merge"}), 400
+    files = {
+        file.filename: file
+        for file in File.query.filter(
+            File.user_id == current_user.id, File.filename.in_(filenames)
+        )
+    }
+    missing = [name for name in filenames if name not in files]
+    if missing:
+        return jsonify({"error": f"{', '.join(missing)} not found"}), 404
+
+    sort_by = request.args.get("sort_by", "---")
+    group_by = request.args.get("group_by", "---")
+    show_top = request.args.get("show_top", type=int)
+    setting_validation = validate_view_setting(sort_by, group_by, show_top)
+    if setting_validation != "":
+        return jsonify({"error": setting_validation}), 400
+    row_format = request.args.get("format", "ndjson")
+    if row_format not in ROW_FORMATS:
+        return jsonify({"error": f"Invalid format: {row_format}"}), 400
+    try:
+        regions = request_regions()
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    # Each file streams its rows in view order, merged without loading them all
+    pagers = [
+        RowPager(files[name], sort_by, group_by, show_top, regions)
+        for name in filenames
+    ]
+    views = [
+        (pager.file.filename, itertools.chain.from_iterable(pager.batches(None)))
+        for pager in pagers
+    ]
+    rows = merge_views(views, sort_by, group_by, show_top)
+    return Response(
+        stream_with_context(
+            format_rows(batched(rows, STREAM_BATCH_SIZE), row_format, MERGED_COLUMNS)
+        ),
+        mimetype=ROW_FORMATS[row_format],
+    )
+
+
+@api.route("/api/files/<filename>/summary", methods=["GET"])
+def file_summary(filename):
+    api_user_validation = validate_api_user(request.authorization)
+    if api_user_validation != "":
+        return jsonify({"error": api_user_validation}), 400
+    file = File.query.filter_by(user_id=current_user.id, filename=filename).first()
+    if file is None:
+        return jsonify({"error": f"{filename} not found"}), 404
+
+    group_by = request.args.get("group_by", "---")
+    if group_by not in SUMMARY_GROUPS:
+        return jsonify({"error": f"Invalid group_by: {group_by}"}), 400
+    try:
+        regions = request_regions()
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    # Whole-file summaries are stored at ingest, region summaries are computed
+    if regions:
+        stats = compute_group_stats(file, group_by, regions)
+    else:
+        stats = read_file_summary(file, group_by)
+    return jsonify({"group_by": group_by, "groups": summary_records(stats)}), 200
+
+
+def request_regions() -> dict[str, Region]:
+    regions = {}
+    for side in ("1", "2"):
+        region = request.args.get(f"region{side}")
+        if region:
+            regions[side] = parse_region(region)
+    return regions
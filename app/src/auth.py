@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from flask import Flask
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from .. import db
+from .database import User
+
+
+class UserCache:
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        # Column values rather than instances, which belong to one session
+        self.entries: dict[int, tuple[float, dict]] = {}
+        self.lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.ttl = app.config["USER_CACHE_TTL"]
+        event.listen(User, "after_update", self.on_change)
+        event.listen(User, "after_delete", self.on_change)
+
+    def get(self, user_id: int) -> User | None:
+        with self.lock:
+            entry = self.entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            user = User(**entry[1])
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+        user = db.session.get(User, user_id)
+        if user is not None and self.ttl > 0:
+            values = {
+                column.key: getattr(user, column.key)
+                for column in User.__table__.columns
+            }
+            with self.lock:
+                self.entries[user_id] = (time.monotonic() + self.ttl, values)
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def on_change(self, mapper, connection, target: User) -> None:
+        self.invalidate(target.id)
+
+
+user_cache = UserCache()
+
+
+class TokenSigner:
+    def __init__(self):
+        self.serializer: URLSafeTimedSerializer | None = None
+        self.max_age = 24 * 3600
+
+    def init_app(self, app: Flask) -> None:
+        self.max_age = app.config["API_TOKEN_MAX_AGE"]
+        self.serializer = URLSafeTimedSerializer(
+            app.config["SECRET_KEY"],
+            salt="api-token",
+            signer_kwargs={"digest_method": hashlib.sha256},
+        )
+
+    def issue(self, user: User) -> str:
+        return self.serializer.dumps(
+            {"id": user.id, "key": password_fingerprint(user)}
+        )
+
+    def verify(self, token: str) -> User | None:
+        try:
+            payload = self.serializer.loads(token, max_age=self.max_age)
+        except BadSignature:
+            return None
+        user = user_cache.get(payload["id"])
+        # Changing the password revokes every token issued before
+        if user is None or payload["key"] != password_fingerprint(user):
+            return None
+        return user
+
+
+def password_fingerprint(user: User) -> str:
+    return hashlib.sha256(user.password.encode()).hexdigest()[:16]
+
+
+token_signer = TokenSigner()
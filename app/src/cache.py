@@ -0,0 +1,74 @@
+import sys
+import threading
+from collections import OrderedDict
+from flask import Flask
+
+# (file_id, sort_by, group_by, show_top)
+ViewKey = tuple[int, str, str, int]
+
+
+def estimate_size(rows: list) -> int:
+    return sys.getsizeof(rows) + sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        for row in rows
+    )
+
+
+class ViewCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[ViewKey, tuple[list, int]] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.max_bytes = app.config["VIEW_CACHE_MAX_BYTES"]
+
+    def get(self, key: ViewKey) -> list | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: ViewKey, rows: list) -> None:
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (rows, size)
+            self.size += size
+            # Evict least recently used views until back under the byte budget
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def invalidate_file(self, file_id: int) -> None:
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == file_id]:
+                self.size -= self.entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+view_cache = ViewCache()
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+import struct
+import numpy as np
+from flask import current_app
+from .region import build_region_index
+from .table import COLUMN_DTYPES, COLUMN_NAMES, RANKED_COLUMNS, ColumnTable
+
+# File layout: MAGIC, uint64 header length, JSON header, then one aligned
+# fixed-width array per column. String columns are stored as int32 codes
+# into a per-column dictionary kept in the header. The interval index of
+# each side follows the columns.
+MAGIC = b"CSVCOL01"
+ALIGNMENT = 64
+CODE_DTYPE = np.dtype("<i4")
+INDEX_DTYPES: dict[str, np.dtype] = {"keys": np.dtype("<u8"), "rows": np.dtype("<i8")}
+
+
+def columnar_path(file_id: int) -> str:
+    storage_path = current_app.config["COLUMNAR_STORAGE_PATH"]
+    return os.path.join(storage_path, f"{file_id}.col")
+
+
+def column_dtype(name: str) -> np.dtype:
+    if name in RANKED_COLUMNS:
+        return CODE_DTYPE
+    return np.dtype(COLUMN_DTYPES[name]).newbyteorder("<")
+
+
+class ColumnarWriter:
+    def __init__(self, path: str, region_indexes: bool = True):
+        self.path = path
+        self.region_indexes = region_indexes
+        self.row_count = 0
+        self.dictionaries: dict[str, dict[str, int]] = {
+            name: {} for name in RANKED_COLUMNS
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Columns are spilled to one temporary file each while streaming
+        self.spills = {name: open(f"{path}.{name}.tmp", "wb") for name in COLUMN_NAMES}
+        self.index_spills: list[str] = []
+
+    def extend(self, table: ColumnTable) -> None:
+        # Copies an existing table ahead of any appended rows. Its codes stay
+        # valid because the dictionaries keep their first-seen order.
+        for name in RANKED_COLUMNS:
+            dictionary = self.dictionaries[name]
+            for value in table.dictionaries[name].tolist():
+                dictionary.setdefault(value, len(dictionary))
+        for name in COLUMN_NAMES:
+            np.asarray(table.columns[name], dtype=column_dtype(name)).tofile(
+                self.spills[name]
+            )
+        self.row_count += table.row_count
+
+    def append(self, rows: list[list]) -> None:
+        for name, values in zip(COLUMN_NAMES, zip(*rows)):
+            if name in RANKED_COLUMNS:
+                dictionary = self.dictionaries[name]
+                values = [
+                    dictionary.setdefault(value, len(dictionary)) for value in values
+                ]
+            np.array(values, dtype=column_dtype(name)).tofile(self.spills[name])
+        self.row_count += len(rows)
+
+    def close(self) -> None:
+        for spill in self.spills.values():
+            spill.close()
+        arrays = {
+            ("columns", name): (column_dtype(name), spill.name)
+            for name, spill in self.spills.items()
+        }
+        if self.region_indexes:
+            arrays.update(self.write_region_indexes())
+        header = {
+            "row_count": self.row_count,
+            "columns": {},
+            "indexes": {},
+            "dictionaries": {
+                name: list(dictionary) for name, dictionary in self.dictionaries.items()
+            },
+        }
+        offset = 0
+        for (section, name), (dtype, _) in arrays.items():
+            header[section][name] = {"dtype": dtype.str, "offset": offset}
+            offset += aligned(self.row_count * dtype.itemsize)
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = aligned(len(MAGIC) + 8 + len(header_bytes))
+        with open(self.path, "wb") as output:
+            output.write(MAGIC)
+            output.write(struct.pack("<Q", len(header_bytes)))
+            output.write(header_bytes)
+            for (section, name), (_, spill_path) in arrays.items():
+                output.seek(data_start + header[section][name]["offset"])
+                with open(spill_path, "rb") as spill:
+                    shutil.copyfileobj(spill, output)
+            output.truncate(data_start + offset)
+        self.remove_spills()
+
+    def write_region_indexes(self) -> dict:
+        # Per side, rows sorted by (chrom, bin, start) for interval lookups
+        index_arrays = {}
+        for side in ("1", "2"):
+            keys, rows = build_region_index(
+                self.read_spill(f"chrom{side}"),
+                self.read_spill(f"start{side}"),
+                self.read_spill(f"end{side}"),
+            )
+            for name, values in (("keys", keys), ("rows", rows)):
+                path = f"{self.path}.region{side}_{name}.tmp"
+                values = values.astype(INDEX_DTYPES[name])
+                values.tofile(path)
+                self.index_spills.append(path)
+                index_arrays[("indexes", f"region{side}_{name}")] = (values.dtype, path)
+        return index_arrays
+
+    def read_spill(self, name: str) -> np.ndarray:
+        return np.fromfile(self.spills[name].name, dtype=column_dtype(name))
+
+    def abort(self) -> None:
+        for spill in self.spills.values():
+            spill.close()
+        self.remove_spills()
+
+    def remove_spills(self) -> None:
+        for spill in self.spills.values():
+            os.remove(spill.name)
+        for path in self.index_spills:
+            os.remove(path)
+
+
+def write_columnar(file_id: int, chunks) -> int:
+    writer = ColumnarWriter(columnar_path(file_id))
+    try:
+        for chunk in chunks:
+            writer.append(chunk)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.row_count
+
+
+def append_columnar(file_id: int, chunks) -> int:
+    # The file is rebuilt next to the old one and swapped in once complete
+    path = columnar_path(file_id)
+    table = read_columnar(path)
+    writer = ColumnarWriter(f"{path}.append")
+    try:
+        writer.extend(table)
+        for chunk in chunks:
+            writer.append(chunk)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    os.replace(writer.path, path)
+    return writer.row_count - table.row_count
+
+
+def copy_columnar(file_id: int, target_id: int) -> None:
+    shutil.copyfile(columnar_path(file_id), columnar_path(target_id))
+
+
+def aligned(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def read_columnar(path: str) -> ColumnTable:
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar table")
+        (header_length,) = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(header_length))
+    data_start = aligned(len(MAGIC) + 8 + header_length)
+    row_count = header["row_count"]
+    arrays = {}
+    for section in ("columns", "indexes"):
+        arrays[section] = {
+            name: map_array(
+                path, data_start + array["offset"], array["dtype"], row_count
+            )
+            for name, array in header.get(section, {}).items()
+        }
+    dictionaries = {
+        name: np.array(values, dtype=str)
+        for name, values in header["dictionaries"].items()
+    }
+    return ColumnTable(arrays["columns"], dictionaries, arrays["indexes"])
+
+
+def map_array(path: str, offset: int, dtype: str, row_count: int) -> np.ndarray:
+    if row_count == 0:
+        return np.empty(0, dtype=np.dtype(dtype))
+    # A read-only view straight onto the mapped file
+    return np.memmap(
+        path, dtype=np.dtype(dtype), mode="r", offset=offset, shape=(row_count,)
+    )
+
+
+def remove_columnar(file_id: int) -> None:
+    path = columnar_path(file_id)
+    if os.path.exists(path):
+        os.remove(path)
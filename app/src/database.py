@@ -12,8 +12,76 @@ class Content(db.Model):
     start2 = db.Column(db.Integer, nullable=False)
     end2 = db.Column(db.Integer, nullable=False)
     sample = db.Column(db.String(150), nullable=False)
-    score = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
     file_id = db.Column(db.Integer, db.ForeignKey("file.id"))
+    # Natural sort keys: chr1..chr22, X, Y and S1, S2, ... as integers
+    chrom1_rank = db.Column(db.Integer)
+    chrom2_rank = db.Column(db.Integer)
+    sample_rank = db.Column(db.Integer)
+    # Interval bins of side 1 and side 2 for region queries
+    bin1 = db.Column(db.Integer)
+    bin2 = db.Column(db.Integer)
+
+    # Every view filters on file_id, then groups and/or sorts on one column
+    # Ungrouped views read the first rows of a (file_id, sort column) index.
+    # Grouped views number every row of the file with ROW_NUMBER(), which a
+    # (file_id, group, sort column) index would not avoid, so there is none.
+    __table_args__ = (
+        db.Index("ix_content_file_id", "file_id"),
+        db.Index("ix_content_file_chrom1", "file_id", "chrom1_rank", "chrom1"),
+        db.Index("ix_content_file_chrom2", "file_id", "chrom2_rank", "chrom2"),
+        db.Index("ix_content_file_sample", "file_id", "sample_rank", "sample"),
+        db.Index("ix_content_file_start1", "file_id", "start1"),
+        db.Index("ix_content_file_end1", "file_id", "end1"),
+        db.Index("ix_content_file_start2", "file_id", "start2"),
+        db.Index("ix_content_file_end2", "file_id", "end2"),
+        db.Index("ix_content_file_score", "file_id", "score"),
+        db.Index("ix_content_file_region1", "file_id", "chrom1", "bin1", "start1"),
+        db.Index("ix_content_file_region2", "file_id", "chrom2", "bin2", "start2"),
+    )
+
+
+class Summary(db.Model):
+    # Whole-file statistics per group_by option, written at ingest
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey("file.id"))
+    group_by = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(150))
+    rank = db.Column(db.Integer)
+    row_count = db.Column(db.Integer, nullable=False)
+    score_sum = db.Column(db.Float, nullable=False)
+    score_min = db.Column(db.Float, nullable=False)
+    score_max = db.Column(db.Float, nullable=False)
+    span1_sum = db.Column(db.Integer, nullable=False)
+    span1_max = db.Column(db.Integer, nullable=False)
+    span2_sum = db.Column(db.Integer, nullable=False)
+    span2_max = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index("ix_summary_file_group", "file_id", "group_by"),)
+
+
+class TopRow(db.Model):
+    # The first rows of every group of every sort_by/group_by view, up to the
+    # largest homepage show_top, written at ingest
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey("file.id"))
+    sort_by = db.Column(db.String(20), nullable=False)
+    group_by = db.Column(db.String(20), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # In view order
+    row_number = db.Column(db.Integer, nullable=False)  # Within its group, from 1
+    row_index = db.Column(db.Integer, nullable=False)  # In upload order, from 0
+    chrom1 = db.Column(db.String(150), nullable=False)
+    start1 = db.Column(db.Integer, nullable=False)
+    end1 = db.Column(db.Integer, nullable=False)
+    chrom2 = db.Column(db.String(150), nullable=False)
+    start2 = db.Column(db.Integer, nullable=False)
+    end2 = db.Column(db.Integer, nullable=False)
+    sample = db.Column(db.String(150), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_top_row_view", "file_id", "sort_by", "group_by", "row_number"),
+    )
 
 
 class Setting(db.Model):
@@ -29,9 +97,52 @@ class File(db.Model):
     filename = db.Column(db.String(200), nullable=False)
     date = db.Column(db.DateTime(timezone=True), default=func.now())
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    contents = db.relationship("Content")
+    storage = db.Column(db.String(20), default="sql")  # "sql" or "columnar"
+    row_count = db.Column(db.Integer)
+    # Rows, columnar file and summaries live under data_id, which files uploaded
+    # with identical bytes (same SHA-256 content_hash) share
+    data_id = db.Column(db.Integer)
+    content_hash = db.Column(db.String(64), index=True)
+    # Comma separated header, appended uploads must match it
+    header = db.Column(db.String(500))
+    # Deleting a File must not null file_id on rows another file may share
+    contents = db.relationship("Content", passive_deletes="all")
     Settings = db.relationship("Setting")
 
+
+class UploadJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(200), nullable=False)
+    content_encoding = db.Column(db.String(20))
+    append = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    error = db.Column(db.String(500))
+    row_count = db.Column(db.Integer)
+    seconds = db.Column(db.Float)
+    date = db.Column(db.DateTime(timezone=True), default=func.now())
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+
+
+class UploadSession(db.Model):
+    # A resumable upload whose numbered parts are checked and spooled as they
+    # arrive, then ingested in one pass on completion
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(200), nullable=False)
+    content_encoding = db.Column(db.String(20))
+    append = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), nullable=False, default="open")
+    next_part = db.Column(db.Integer, nullable=False, default=1)
+    # Header line, parsed again before every part, and the unfinished last line
+    header = db.Column(db.String(500))
+    tail = db.Column(db.LargeBinary, nullable=False, default=b"")
+    # Lines spooled so far, header included, so rows are numbered across parts
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    seconds = db.Column(db.Float, nullable=False, default=0)
+    date = db.Column(db.DateTime(timezone=True), default=func.now())
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True)
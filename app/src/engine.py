@@ -0,0 +1,43 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "SQLITE_JOURNAL_MODE",
+    "synchronous": "SQLITE_SYNCHRONOUS",
+    "cache_size": "SQLITE_CACHE_SIZE",
+    "mmap_size": "SQLITE_MMAP_SIZE",
+    "busy_timeout": "SQLITE_BUSY_TIMEOUT",
+}
+
+
+def is_memory_sqlite(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(config) -> dict:
+    # In-memory SQLite uses a single static connection, so there is no pool to size
+    if is_memory_sqlite(config["SQLALCHEMY_DATABASE_URI"]):
+        return {}
+    return {
+        "pool_size": config["DATABASE_POOL_SIZE"],
+        "max_overflow": config["DATABASE_MAX_OVERFLOW"],
+        "pool_timeout": config["DATABASE_POOL_TIMEOUT"],
+    }
+
+
+def configure_engine(engine: Engine, config) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = [
+        f"PRAGMA {pragma} = {config[key]}"
+        for pragma, key in SQLITE_PRAGMAS.items()
+        if config[key] is not None
+    ]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
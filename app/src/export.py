@@ -0,0 +1,80 @@
+import os
+import tempfile
+from typing import Iterator
+from sqlalchemy import select
+from .. import db
+from .columnar import ColumnarWriter, columnar_path, read_columnar
+from .query import VIEW_COLUMNS, key_order, keyset_source
+from .topview import top_view_source
+
+EXPORT_BATCH_ROWS = 50_000
+EXPORT_BLOCK_SIZE = 1024 * 1024
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "csv": ("text/csv", "csv"),
+    "tsv": ("text/tab-separated-values", "tsv"),
+    "columnar": ("application/octet-stream", "col"),
+}
+
+
+def is_unsorted(sort_by: str, group_by: str, show_top: int | None) -> bool:
+    return sort_by == "---" and group_by == "---" and show_top is None
+
+
+def export_batches(
+    file, sort_by: str, group_by: str, show_top: int | None
+) -> Iterator[list]:
+    # Rows in view order, EXPORT_BATCH_ROWS at a time
+    if file.storage == "columnar":
+        table = read_columnar(columnar_path(file.data_id))
+        if is_unsorted(sort_by, group_by, show_top):
+            for start in range(0, table.row_count, EXPORT_BATCH_ROWS):
+                yield table.rows(slice(start, start + EXPORT_BATCH_ROWS))
+            return
+        indices = table.view_indices(
+            sort_by, group_by, table.row_count if show_top is None else show_top
+        )
+        for start in range(0, len(indices), EXPORT_BATCH_ROWS):
+            yield table.rows(indices[start : start + EXPORT_BATCH_ROWS])
+        return
+    # One cursor streamed to the end, rather than a keyset query per batch
+    source, keys = top_view_source(
+        file, sort_by, group_by, show_top
+    ) or keyset_source(file.data_id, sort_by, group_by, show_top)
+    statement = select(*[source.c[column.key] for column in VIEW_COLUMNS]).order_by(
+        *key_order(keys)
+    )
+    connection = db.session.connection().execution_options(
+        yield_per=EXPORT_BATCH_ROWS
+    )
+    yield from connection.execute(statement).partitions()
+
+
+def export_columnar(
+    file, sort_by: str, group_by: str, show_top: int | None
+) -> tuple[str, bool]:
+    # Returns the path to send and whether it is a temporary copy to remove
+    if file.storage == "columnar" and is_unsorted(sort_by, group_by, show_top):
+        return columnar_path(file.data_id), False
+    descriptor, path = tempfile.mkstemp(prefix="export-", suffix=".col")
+    os.close(descriptor)
+    # Exports skip the interval index, which needs whole columns in memory
+    writer = ColumnarWriter(path, region_indexes=False)
+    try:
+        for rows in export_batches(file, sort_by, group_by, show_top):
+            writer.append(rows)
+    except Exception:
+        writer.abort()
+        os.remove(path)
+        raise
+    writer.close()
+    return path, True
+
+
+def stream_temporary_file(path: str) -> Iterator[bytes]:
+    # Removed once sent, or when the client disconnects and the stream is closed
+    try:
+        with open(path, "rb") as file:
+            while block := file.read(EXPORT_BLOCK_SIZE):
+                yield block
+    finally:
+        os.remove(path)
@@ -10,6 +10,7 @@ from flask_login import login_required, current_user
 from werkzeug import Response
 from .util import (
     file_delete_response,
+    file_merge_response,
     file_operate_response,
     file_post_response,
     file_select_response,
@@ -23,6 +24,7 @@ homepage: Blueprint = Blueprint("homepage", __name__)
 @login_required
 def home() -> str | Response:
     file_contents = read_status_from_database()
+    merged_data = None
 
     if request.method == "POST":
         file_upload = file_post_response()
@@ -39,6 +41,7 @@ def home() -> str | Response:
         file_operation = file_operate_response(file_contents)
         if file_operation != "":
             flash(file_operation, category="success")
+        merged_data = file_merge_response(file_contents)
         file_delete = file_delete_response()
 
         if file_delete != "":
@@ -46,5 +49,8 @@ def home() -> str | Response:
             return redirect(url_for("homepage.home"))
 
     return render_template(
-        "homepage.html", user=current_user, file_contents=file_contents
+        "homepage.html",
+        user=current_user,
+        file_contents=file_contents,
+        merged_data=merged_data,
     )
@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO
+from flask import Flask, g
+from .. import db
+from .database import UploadJob, UploadSession, User
+from .util import ingest_fileStream
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadQueue:
+    def __init__(self):
+        self.app: Flask | None = None
+        self.executor: ThreadPoolExecutor | None = None
+        self.spool_path = ""
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.spool_path = app.config["UPLOAD_SPOOL_PATH"]
+        workers = app.config["UPLOAD_WORKERS"]
+        # Zero workers keeps /api/upload synchronous
+        self.executor = ThreadPoolExecutor(workers) if workers > 0 else None
+
+    def recover(self) -> None:
+        # At start-up, within an app context: jobs left queued or running by a
+        # stopped process run again when their body is spooled, an ingest being
+        # one transaction, and spooled files nothing refers to are removed
+        jobs = UploadJob.query.filter(UploadJob.status.in_(["queued", "running"]))
+        resumed = []
+        for job in jobs:
+            if self.is_async and os.path.exists(self.job_path(job.id)):
+                job.status = "queued"
+                resumed.append(job.id)
+            else:
+                job.status = "failed"
+                job.error = "Interrupted by a restart"
+        db.session.commit()
+        kept = set(resumed)
+        for upload in UploadSession.query.filter_by(status="open"):
+            kept.update(f"{upload.id}.{part}" for part in range(1, upload.next_part))
+        if os.path.isdir(self.spool_path):
+            for name in os.listdir(self.spool_path):
+                path = os.path.join(self.spool_path, name)
+                if name not in kept and os.path.isfile(path):
+                    os.remove(path)
+        for job_id in resumed:
+            self.executor.submit(self.run, job_id)
+
+    @property
+    def is_async(self) -> bool:
+        return self.executor is not None
+
+    def job_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_path, job_id)
+
+    def spool(self, stream: IO[bytes]) -> IO[bytes]:
+        # A seekable copy of a synchronous upload, so it is hashed and a
+        # duplicate linked before anything is parsed
+        os.makedirs(self.spool_path, exist_ok=True)
+        spool = tempfile.NamedTemporaryFile(dir=self.spool_path)
+        shutil.copyfileobj(stream, spool, COPY_BUFFER_SIZE)
+        spool.seek(0)
+        return spool
+
+    def enqueue(
+        self,
+        stream: IO[bytes],
+        filename: str,
+        user,
+        content_encoding: str | None = None,
+        append: bool = False,
+    ) -> UploadJob:
+        job = self.new_job(filename, user, content_encoding, append)
+        os.makedirs(self.spool_path, exist_ok=True)
+        with open(self.job_path(job.id), "wb") as spool:
+            shutil.copyfileobj(stream, spool, COPY_BUFFER_SIZE)
+        return self.submit(job)
+
+    def enqueue_file(
+        self, path: str, filename: str, user, append: bool = False
+    ) -> UploadJob:
+        # A spooled file, e.g. the joined parts of a resumable upload, is moved
+        job = self.new_job(filename, user, None, append)
+        os.replace(path, self.job_path(job.id))
+        return self.submit(job)
+
+    def new_job(
+        self, filename: str, user, content_encoding: str | None, append: bool
+    ) -> UploadJob:
+        return UploadJob(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            content_encoding=content_encoding,
+            append=append,
+            user_id=user.id,
+        )
+
+    def submit(self, job: UploadJob) -> UploadJob:
+        db.session.add(job)
+        db.session.commit()
+        self.executor.submit(self.run, job.id)
+        return job
+
+    def run(self, job_id: str) -> None:
+        with self.app.app_context():
+            job = db.session.get(UploadJob, job_id)
+            job.status = "running"
+            db.session.commit()
+            try:
+                with open(self.job_path(job_id), "rb") as stream:
+                    status = ingest_fileStream(
+                        stream,
+                        job.filename,
+                        db.session.get(User, job.user_id),
+                        job.content_encoding,
+                        job.append,
+                    )
+            except Exception as error:
+                db.session.rollback()
+                status = f"Upload failed: {error}"
+            finally:
+                os.remove(self.job_path(job_id))
+            if status == "ok":
+                job.status = "done"
+                job.row_count = g.ingest_stats["rows"]
+                job.seconds = g.ingest_stats["seconds"]
+            else:
+                job.status = "failed"
+                job.error = status[:500]
+            db.session.commit()
+
+
+def job_status(job: UploadJob) -> dict:
+    status = {"job_id": job.id, "filename": job.filename, "status": job.status}
+    if job.status == "done":
+        status["rows"] = job.row_count
+        status["seconds"] = job.seconds
+        status["rows_per_second"] = (
+            round(job.row_count / job.seconds) if job.seconds else job.row_count
+        )
+    if job.status == "failed":
+        status["error"] = job.error
+    return status
+
+
+upload_queue = UploadQueue()
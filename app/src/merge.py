@@ -0,0 +1,70 @@
+import heapq
+import itertools
+from collections import defaultdict, namedtuple
+from typing import Callable, Iterable, Iterator
+from .table import COLUMN_NAMES, RANKED_COLUMNS
+
+MERGED_COLUMNS: list[str] = ["filename", *COLUMN_NAMES]
+
+MergedRow = namedtuple("MergedRow", MERGED_COLUMNS)
+
+
+def view_key(sort_by: str, group_by: str) -> Callable[[MergedRow], tuple]:
+    # The order of every file view, without its final tie-break on upload order
+    group_rank = RANKED_COLUMNS.get(group_by)
+    sort_rank = RANKED_COLUMNS.get(sort_by)
+    is_sorted = sort_by in COLUMN_NAMES
+
+    def key(row: MergedRow) -> tuple:
+        group_key = ()
+        if group_rank is not None:
+            value = getattr(row, group_by)
+            group_key = (group_rank(value), value)
+        if sort_rank is not None:
+            return (*group_key, sort_rank(getattr(row, sort_by)))
+        if is_sorted:
+            return (*group_key, -getattr(row, sort_by))
+        return group_key
+
+    return key
+
+
+def tag_rows(filename: str, rows: Iterable) -> Iterator[MergedRow]:
+    for row in rows:
+        yield MergedRow(filename, *(getattr(row, name) for name in COLUMN_NAMES))
+
+
+def merge_views(
+    views: Iterable[tuple[str, Iterable]],
+    sort_by: str,
+    group_by: str,
+    show_top: int | None,
+) -> Iterator[MergedRow]:
+    # k-way merge of (filename, rows) views that are each in view order already;
+    # equal keys keep the order of the views, as if the files were one upload
+    merged = heapq.merge(
+        *(tag_rows(filename, rows) for filename, rows in views),
+        key=view_key(sort_by, group_by),
+    )
+    if show_top is None:
+        return merged
+    if group_by not in RANKED_COLUMNS:
+        return itertools.islice(merged, show_top)
+    return top_per_group(merged, group_by, show_top)
+
+
+def top_per_group(
+    rows: Iterable[MergedRow], group_by: str, show_top: int
+) -> Iterator[MergedRow]:
+    counts = defaultdict(int)
+    for row in rows:
+        group = getattr(row, group_by)
+        counts[group] += 1
+        if counts[group] <= show_top:
+            yield row
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
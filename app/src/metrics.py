@@ -0,0 +1,285 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from flask import (
+    Flask,
+    Response,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .. import db
+from .cache import view_cache
+
+METRIC_PREFIX = "csv_parser"
+
+
+def reset_peak_rss() -> bool:
+    # Linux only: writing 5 to clear_refs resets the VmHWM high-water mark of
+    # the whole process, so it is only for single-threaded measurements
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss() -> int | None:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = defaultdict(float)
+        # Phases are exclusive: entering one pauses the phase it runs inside
+        self.stack: list[tuple[str, float]] = []
+        self.sql_queries = 0
+        self.rows = 0
+        self.orm_objects = 0
+        self.profile: cProfile.Profile | None = None
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self.stack:
+            parent, resumed = self.stack[-1]
+            self.phases[parent] += now - resumed
+        self.stack.append((name, now))
+
+    def exit(self) -> None:
+        now = time.perf_counter()
+        name, resumed = self.stack.pop()
+        self.phases[name] += now - resumed
+        if self.stack:
+            self.stack[-1] = (self.stack[-1][0], now)
+
+    def server_timing(self, total: float) -> str:
+        timings = [
+            f'sql;dur={self.phases["sql"] * 1000:.2f};desc="{self.sql_queries} queries"'
+        ]
+        timings += [
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in self.phases.items()
+            if name != "sql"
+        ]
+        timings.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(timings)
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.profile_sample_rate = 0.0
+        self.profile_path = ""
+        self.lock = threading.Lock()
+        # Aggregates per endpoint since start-up, served by /metrics
+        self.requests: dict[tuple[str, str, int], int] = defaultdict(int)
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.phase_seconds: dict[tuple[str, str], float] = defaultdict(float)
+        self.sql_queries: dict[str, int] = defaultdict(int)
+        self.rows: dict[str, int] = defaultdict(int)
+        self.orm_objects: dict[str, int] = defaultdict(int)
+
+    def init_app(self, app: Flask) -> None:
+        self.enabled = app.config["INSTRUMENTATION"]
+        if not self.enabled:
+            return
+        self.profile_sample_rate = app.config["PROFILE_SAMPLE_RATE"]
+        self.profile_path = app.config["PROFILE_PATH"]
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_response)
+        before_render_template.connect(self.enter_render, app)
+        template_rendered.connect(self.exit_render, app)
+        event.listen(Engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(Engine, "handle_error", self.handle_error)
+        event.listen(db.Model, "load", self.on_load, propagate=True)
+
+    @property
+    def current(self) -> RequestMetrics | None:
+        if not self.enabled or not has_request_context():
+            return None
+        return g.get("request_metrics")
+
+    def phase(self, name: str):
+        metrics = self.current
+        if metrics is None:
+            return nullcontext()
+        return self.timed_phase(metrics, name)
+
+    @contextmanager
+    def timed_phase(self, metrics: RequestMetrics, name: str):
+        metrics.enter(name)
+        try:
+            yield
+        finally:
+            metrics.exit()
+
+    def add_rows(self, row_count: int) -> None:
+        metrics = self.current
+        if metrics is not None:
+            metrics.rows += row_count
+
+    def start_request(self) -> None:
+        metrics = g.request_metrics = RequestMetrics()
+        if random.random() < self.profile_sample_rate:
+            metrics.profile = cProfile.Profile()
+            metrics.profile.enable()
+
+    def finish_request(self, response: Response) -> Response:
+        metrics = g.pop("request_metrics", None)
+        if metrics is None:
+            return response
+        total = time.perf_counter() - metrics.started
+        if metrics.profile is not None:
+            metrics.profile.disable()
+            self.dump_profile(metrics.profile)
+        response.headers["Server-Timing"] = metrics.server_timing(total)
+        self.record(metrics, total, response.status_code)
+        return response
+
+    def dump_profile(self, profile: cProfile.Profile) -> None:
+        os.makedirs(self.profile_path, exist_ok=True)
+        name = f"{time.time():.6f}-{request.endpoint or 'unmatched'}.prof"
+        profile.dump_stats(os.path.join(self.profile_path, name))
+
+    def record(self, metrics: RequestMetrics, total: float, status: int) -> None:
+        endpoint = request.endpoint or "unmatched"
+        with self.lock:
+            self.requests[(endpoint, request.method, status)] += 1
+            self.seconds[endpoint] += total
+            for name, seconds in metrics.phases.items():
+                self.phase_seconds[(endpoint, name)] += seconds
+            self.sql_queries[endpoint] += metrics.sql_queries
+            self.rows[endpoint] += metrics.rows
+            self.orm_objects[endpoint] += metrics.orm_objects
+
+    def enter_render(self, app, template, context) -> None:
+        metrics = self.current
+        if metrics is not None:
+            metrics.enter("render")
+
+    def exit_render(self, app, template, context) -> None:
+        metrics = self.current
+        if metrics is not None:
+            metrics.exit()
+
+    def before_cursor_execute(self, *args) -> None:
+        metrics = self.current
+        if metrics is not None:
+            metrics.enter("sql")
+
+    def after_cursor_execute(self, *args) -> None:
+        metrics = self.current
+        if metrics is not None:
+            metrics.exit()
+            metrics.sql_queries += 1
+
+    def handle_error(self, context) -> None:
+        metrics = self.current
+        if metrics is not None and metrics.stack and metrics.stack[-1][0] == "sql":
+            metrics.exit()
+
+    def on_load(self, target, context) -> None:
+        metrics = self.current
+        if metrics is not None:
+            metrics.orm_objects += 1
+
+    def metrics_response(self) -> Response:
+        return Response(self.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+    def prometheus_text(self) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                if label_text:
+                    label_text = f"{{{label_text}}}"
+                lines.append(f"{METRIC_PREFIX}_{name}{label_text} {value}")
+
+        with self.lock:
+            metric(
+                "requests_total",
+                "counter",
+                "Requests by endpoint, method and status.",
+                [
+                    ((("endpoint", endpoint), ("method", method), ("status", code)), n)
+                    for (endpoint, method, code), n in self.requests.items()
+                ],
+            )
+            metric(
+                "request_seconds_total",
+                "counter",
+                "Time spent handling requests.",
+                [
+                    ((("endpoint", endpoint),), seconds)
+                    for endpoint, seconds in self.seconds.items()
+                ],
+            )
+            metric(
+                "phase_seconds_total",
+                "counter",
+                "Exclusive time per request phase: sql, view, render.",
+                [
+                    ((("endpoint", endpoint), ("phase", phase)), seconds)
+                    for (endpoint, phase), seconds in self.phase_seconds.items()
+                ],
+            )
+            for name, help_text, values in (
+                ("sql_queries_total", "SQL statements executed.", self.sql_queries),
+                ("view_rows_total", "Rows returned by file views.", self.rows),
+                ("orm_objects_total", "ORM objects loaded.", self.orm_objects),
+            ):
+                metric(
+                    name,
+                    "counter",
+                    help_text,
+                    [((("endpoint", endpoint),), n) for endpoint, n in values.items()],
+                )
+        # Of the whole process: threaded requests share one high-water mark
+        process_peak_rss = peak_rss()
+        if process_peak_rss is not None:
+            metric(
+                "process_peak_rss_bytes",
+                "gauge",
+                "Highest resident memory of the process since it started.",
+                [((), process_peak_rss)],
+            )
+        cache = view_cache.stats()
+        for name in ("hits", "misses", "evictions"):
+            metric(
+                f"view_cache_{name}_total",
+                "counter",
+                f"View cache {name}.",
+                [((), cache[name])],
+            )
+        for name, help_text in (
+            ("entries", "Views in the view cache."),
+            ("bytes", "View cache size."),
+            ("max_bytes", "View cache memory budget."),
+        ):
+            metric(f"view_cache_{name}", "gauge", help_text, [((), cache[name])])
+        return "\n".join(lines) + "\n"
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,122 @@
+from sqlalchemy import Integer, bindparam, inspect, select, text, update
+from .. import db
+from .database import Content, File, UploadJob, UploadSession
+from .query import sort_key_values
+from .region import region_bin
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade_database() -> None:
+    with db.engine.begin() as connection:
+        added_columns = add_missing_columns(connection, Content)
+        if "chrom1_rank" in added_columns:
+            backfill_sort_keys(connection)
+        if "bin1" in added_columns:
+            backfill_region_bins(connection)
+        added_columns = add_missing_columns(connection, File)
+        if "row_count" in added_columns:
+            backfill_row_counts(connection)
+        if "data_id" in added_columns:
+            connection.execute(text("UPDATE file SET data_id = id"))
+        add_missing_columns(connection, UploadJob)
+        added_columns = add_missing_columns(connection, UploadSession)
+        if "line_count" in added_columns:
+            # Earlier sessions wrote their parts straight to the file, so they
+            # cannot be completed from spooled parts
+            connection.execute(
+                text(
+                    "UPDATE upload_session SET line_count = 0, status = CASE "
+                    "WHEN status = 'open' THEN 'expired' ELSE status END"
+                )
+            )
+    convert_score_to_float()
+    create_missing_indexes()
+
+
+def add_missing_columns(connection, model) -> list[str]:
+    table = model.__table__
+    existing_columns = {
+        column["name"] for column in inspect(connection).get_columns(table.name)
+    }
+    added_columns = []
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(
+            text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+        )
+        added_columns.append(column.name)
+    return added_columns
+
+
+def backfill_sort_keys(connection) -> None:
+    rows = connection.execute(
+        select(Content.id, Content.chrom1, Content.chrom2, Content.sample)
+    )
+    while batch := rows.fetchmany(BACKFILL_BATCH_SIZE):
+        connection.execute(
+            update(Content.__table__).where(Content.id == bindparam("content_id")),
+            [
+                {"content_id": id, **sort_key_values(chrom1, chrom2, sample)}
+                for id, chrom1, chrom2, sample in batch
+            ],
+        )
+
+
+def backfill_region_bins(connection) -> None:
+    rows = connection.execute(
+        select(Content.id, Content.start1, Content.end1, Content.start2, Content.end2)
+    )
+    while batch := rows.fetchmany(BACKFILL_BATCH_SIZE):
+        connection.execute(
+            update(Content.__table__).where(Content.id == bindparam("content_id")),
+            [
+                {
+                    "content_id": id,
+                    "bin1": region_bin(start1, end1),
+                    "bin2": region_bin(start2, end2),
+                }
+                for id, start1, end1, start2, end2 in batch
+            ],
+        )
+
+
+def backfill_row_counts(connection) -> None:
+    connection.execute(
+        text(
+            "UPDATE file SET row_count = "
+            "(SELECT count(*) FROM content WHERE content.file_id = file.id)"
+        )
+    )
+
+
+def convert_score_to_float() -> None:
+    score_column = next(
+        column
+        for column in inspect(db.engine).get_columns("content")
+        if column["name"] == "score"
+    )
+    if not isinstance(score_column["type"], Integer):
+        return
+    # SQLite cannot change a column type in place, so the table is rebuilt
+    column_names = ", ".join(column.name for column in Content.__table__.columns)
+    with db.engine.begin() as connection:
+        connection.execute(text("ALTER TABLE content RENAME TO content_old"))
+        Content.__table__.create(connection)
+        connection.execute(
+            text(
+                f"INSERT INTO content ({column_names}) "
+                f"SELECT {column_names} FROM content_old"
+            )
+        )
+        connection.execute(text("UPDATE content SET score = CAST(score AS REAL)"))
+        connection.execute(text("DROP TABLE content_old"))
+
+
+def create_missing_indexes() -> None:
+    with db.engine.begin() as connection:
+        for model in (Content, File):
+            for index in model.__table__.indexes:
+                index.create(connection, checkfirst=True)
@@ -0,0 +1,44 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from flask import Flask
+
+
+class ParsePool:
+    # The parser processes of an app, started on the first parallel parse and
+    # shared by every upload after it, since spawning them costs about a second
+    def __init__(self):
+        self.workers = 1
+        self.executor: ProcessPoolExecutor | None = None
+        self.lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def init_app(self, app: Flask) -> None:
+        self.shutdown()
+        self.workers = app.config["PARSE_WORKERS"] or os.cpu_count() or 1
+
+    def get(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    self.workers, mp_context=get_context("spawn")
+                )
+            return self.executor
+
+    def discard(self, executor: ProcessPoolExecutor) -> None:
+        # A pool whose worker died is broken for good, the next parse starts anew
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+parse_pool = ParsePool()
@@ -0,0 +1,245 @@
+from sqlalchemy import Integer, Row, Subquery, func, select
+from .. import db
+from .database import Content
+from .region import Region, sql_region_filter
+
+
+# Natural sort keys, stored on Content at ingest
+
+SPECIAL_CHROMOSOME_RANKS: dict[str, int] = {"X": 23, "Y": 24, "M": 25, "MT": 25}
+UNKNOWN_RANK = 1_000_000
+
+
+def chrom_rank(chrom: str) -> int:
+    name = chrom[3:] if chrom.lower().startswith("chr") else chrom
+    if name.isdigit():
+        return int(name)
+    return SPECIAL_CHROMOSOME_RANKS.get(name.upper(), UNKNOWN_RANK)
+
+
+def sample_rank(sample: str) -> int:
+    number = sample[1:]
+    return int(number) if number.isdigit() else UNKNOWN_RANK
+
+
+def sort_key_values(chrom1: str, chrom2: str, sample: str) -> dict[str, int]:
+    return {
+        "chrom1_rank": chrom_rank(chrom1),
+        "chrom2_rank": chrom_rank(chrom2),
+        "sample_rank": sample_rank(sample),
+    }
+
+
+# Setting -> SQL
+
+VIEW_COLUMNS = [
+    Content.chrom1,
+    Content.start1,
+    Content.end1,
+    Content.chrom2,
+    Content.start2,
+    Content.end2,
+    Content.sample,
+    Content.score,
+]
+# (column, descending) per sort option
+SORT_KEYS = {
+    "chrom1": (Content.chrom1_rank, False),
+    "start1": (Content.start1, True),
+    "end1": (Content.end1, True),
+    "chrom2": (Content.chrom2_rank, False),
+    "start2": (Content.start2, True),
+    "end2": (Content.end2, True),
+    "sample": (Content.sample_rank, False),
+    "score": (Content.score, True),
+}
+SORT_ORDERS = {
+    sort_by: column.desc() if descending else column.asc()
+    for sort_by, (column, descending) in SORT_KEYS.items()
+}
+GROUP_COLUMNS = {
+    "chrom1": (Content.chrom1_rank, Content.chrom1),
+    "chrom2": (Content.chrom2_rank, Content.chrom2),
+    "sample": (Content.sample_rank, Content.sample),
+}
+
+
+def view_order(sort_by: str) -> list:
+    if sort_by in SORT_ORDERS:
+        return [SORT_ORDERS[sort_by], Content.id]
+    return [Content.id]
+
+
+def query_file_view(
+    file_id: int, sort_by: str, group_by: str, show_top: int
+) -> list[Row]:
+    order = view_order(sort_by)
+    if group_by not in GROUP_COLUMNS:
+        statement = (
+            select(*VIEW_COLUMNS)
+            .where(Content.file_id == file_id)
+            .order_by(*order)
+            .limit(show_top)
+        )
+        return db.session.execute(statement).all()
+
+    # Top-N per group: ROW_NUMBER() OVER (PARTITION BY group ORDER BY sort)
+    group_rank, group_column = GROUP_COLUMNS[group_by]
+    ranked = (
+        select(
+            *VIEW_COLUMNS,
+            group_rank.label("group_rank"),
+            func.row_number()
+            .over(partition_by=group_column, order_by=order)
+            .label("row_number"),
+        )
+        .where(Content.file_id == file_id)
+        .subquery()
+    )
+    statement = (
+        select(*[ranked.c[column.key] for column in VIEW_COLUMNS])
+        .where(ranked.c.row_number <= show_top)
+        .order_by(
+            ranked.c.group_rank, ranked.c[group_column.key], ranked.c.row_number
+        )
+    )
+    return db.session.execute(statement).all()
+
+
+# Per group statistics, in the column order of Summary
+
+GROUP_STAT_FIELDS: list[str] = [
+    "row_count",
+    "score_sum",
+    "score_min",
+    "score_max",
+    "span1_sum",
+    "span1_max",
+    "span2_sum",
+    "span2_max",
+]
+
+
+def group_stat_columns() -> list:
+    span1 = Content.end1 - Content.start1
+    span2 = Content.end2 - Content.start2
+    return [
+        func.count(),
+        func.sum(Content.score),
+        func.min(Content.score),
+        func.max(Content.score),
+        func.sum(span1),
+        func.max(span1),
+        func.sum(span2),
+        func.max(span2),
+    ]
+
+
+def query_group_stats(file_id: int, group_by: str, filters: tuple = ()) -> list[tuple]:
+    # (value, rank, *GROUP_STAT_FIELDS) per group in natural rank order
+    if group_by not in GROUP_COLUMNS:
+        statement = select(*group_stat_columns()).where(
+            Content.file_id == file_id, *filters
+        )
+        stats = db.session.execute(statement).one()
+        return [(None, None, *stats)] if stats[0] else []
+    group_rank, group_column = GROUP_COLUMNS[group_by]
+    statement = (
+        select(group_column, group_rank, *group_stat_columns())
+        .where(Content.file_id == file_id, *filters)
+        .group_by(group_rank, group_column)
+        .order_by(group_rank, group_column)
+    )
+    return [tuple(row) for row in db.session.execute(statement)]
+
+
+# Keyset pagination over a whole file
+
+Key = tuple  # (column, descending)
+
+
+def region_filter(side: str, region: Region):
+    return sql_region_filter(
+        getattr(Content, f"chrom{side}"),
+        getattr(Content, f"start{side}"),
+        getattr(Content, f"end{side}"),
+        getattr(Content, f"bin{side}"),
+        region,
+    )
+
+
+def keyset_source(
+    file_id: int,
+    sort_by: str,
+    group_by: str,
+    show_top: int | None,
+    filters: tuple = (),
+) -> tuple[Subquery, list[Key]]:
+    # The view columns plus key0..keyN, which totally order the rows
+    group_columns = GROUP_COLUMNS.get(group_by, ())
+    if show_top is None:
+        keys = [(column, False) for column in group_columns]
+        if sort_by in SORT_KEYS:
+            keys.append(SORT_KEYS[sort_by])
+        keys.append((Content.id, False))
+    else:
+        # Same rows as query_file_view, numbered within their group; typed so
+        # that cursors can be checked against it
+        row_number = func.row_number(type_=Integer).over(
+            partition_by=group_columns[1] if group_columns else None,
+            order_by=view_order(sort_by),
+        )
+        keys = [(column, False) for column in (*group_columns, row_number)]
+    source = (
+        select(*VIEW_COLUMNS, *labelled_keys(keys))
+        .where(Content.file_id == file_id, *filters)
+        .subquery()
+    )
+    if show_top is not None:
+        row_number_key = source.c[f"key{len(keys) - 1}"]
+        source = select(source).where(row_number_key <= show_top).subquery()
+    keys = [
+        (source.c[f"key{index}"], descending)
+        for index, (_, descending) in enumerate(keys)
+    ]
+    return source, keys
+
+
+def labelled_keys(keys: list[Key]) -> list:
+    return [column.label(f"key{index}") for index, (column, _) in enumerate(keys)]
+
+
+def key_order(keys: list[Key]) -> list:
+    return [
+        column.desc() if descending else column.asc() for column, descending in keys
+    ]
+
+
+def fetch_after(
+    source: Subquery, keys: list[Key], cursor: list | None, limit: int
+) -> list[Row]:
+    if cursor is None:
+        statement = select(source).order_by(*key_order(keys)).limit(limit)
+        return db.session.execute(statement).all()
+    # Rows sharing the longest key prefix with the cursor come first, so each
+    # level is a separate index range scan instead of one OR over all levels
+    rows = []
+    for level in reversed(range(len(keys))):
+        column, descending = keys[level]
+        statement = (
+            select(source)
+            .where(
+                *[key == value for (key, _), value in zip(keys[:level], cursor)],
+                column < cursor[level] if descending else column > cursor[level],
+            )
+            .order_by(*key_order(keys[level:]))
+            .limit(limit - len(rows))
+        )
+        rows += db.session.execute(statement).all()
+        if len(rows) == limit:
+            break
+    return rows
+
+
+def row_key(row: Row, keys: list[Key]) -> list:
+    return [row._mapping[column.key] for column, _ in keys]
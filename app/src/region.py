@@ -0,0 +1,137 @@
+import re
+from typing import NamedTuple
+import numpy as np
+from sqlalchemy import and_
+
+# UCSC style binning: 5 levels of bins from 128 kb up to 512 Mb, each
+# interval lives in the smallest bin that fully contains it
+BIN_OFFSETS: list[int] = [512 + 64 + 8 + 1, 64 + 8 + 1, 8 + 1, 1, 0]
+BIN_FIRST_SHIFT = 17
+BIN_NEXT_SHIFT = 3
+MAX_BIN_COORDINATE = 1 << 29
+MAX_LISTED_BINS = 500
+REGION_PATTERN = re.compile(r"^([^:]+)(?::([\d,]+)-([\d,]+))?$")
+
+
+class Region(NamedTuple):
+    chrom: str
+    start: int
+    end: int
+
+
+def parse_region(text: str) -> Region:
+    # "chr7:40,000,000-41,000,000" or a whole chromosome "chr7"
+    match = REGION_PATTERN.match(text.strip())
+    if match is None:
+        raise ValueError(f"Invalid region: {text}")
+    chrom, start, end = match.groups()
+    if start is None:
+        return Region(chrom, 0, np.iinfo(np.int64).max)
+    region = Region(chrom, int(start.replace(",", "")), int(end.replace(",", "")))
+    if region.end <= region.start:
+        raise ValueError(f"Invalid region: {text}")
+    return region
+
+
+def clamp_interval(start: int, end: int) -> tuple[int, int]:
+    start = min(max(start, 0), MAX_BIN_COORDINATE - 1)
+    end = min(max(end, start + 1), MAX_BIN_COORDINATE)
+    return start, end
+
+
+def region_bin(start: int, end: int) -> int:
+    start, end = clamp_interval(start, end)
+    start_bin = start >> BIN_FIRST_SHIFT
+    end_bin = (end - 1) >> BIN_FIRST_SHIFT
+    for offset in BIN_OFFSETS:
+        if start_bin == end_bin:
+            return offset + start_bin
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    return 0
+
+
+def overlapping_bins(start: int, end: int) -> list[tuple[int, int]]:
+    # Inclusive bin ranges, one per level, that can hold an overlapping interval
+    start, end = clamp_interval(start, end)
+    start_bin = start >> BIN_FIRST_SHIFT
+    end_bin = (end - 1) >> BIN_FIRST_SHIFT
+    bin_ranges = []
+    for offset in BIN_OFFSETS:
+        bin_ranges.append((offset + start_bin, offset + end_bin))
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    return bin_ranges
+
+
+def sql_region_filter(chrom, start, end, bin, region: Region):
+    # Listing the bins lets SQLite seek (file_id, chrom, bin, start) once per bin,
+    # "+ 0" keeps the planner off the plain start/end indexes
+    bin_ranges = overlapping_bins(region.start, region.end)
+    bins = [b for low, high in bin_ranges for b in range(low, high + 1)]
+    if len(bins) > MAX_LISTED_BINS:
+        return and_(
+            chrom == region.chrom, start + 0 < region.end, end + 0 > region.start
+        )
+    return and_(
+        chrom == region.chrom, bin.in_(bins), start < region.end, end + 0 > region.start
+    )
+
+
+# Columnar files: rows sorted by a (chrom code, bin, start) uint64 key
+
+KEY_CHROM_SHIFT = 48
+KEY_BIN_SHIFT = 32
+KEY_MAX_START = (1 << 32) - 1
+
+
+def region_key(codes, bins, starts):
+    return (
+        (np.asarray(codes, dtype=np.uint64) << np.uint64(KEY_CHROM_SHIFT))
+        | (np.asarray(bins, dtype=np.uint64) << np.uint64(KEY_BIN_SHIFT))
+        | np.minimum(starts, KEY_MAX_START).astype(np.uint64)
+    )
+
+
+def region_bins(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    starts = np.clip(starts, 0, MAX_BIN_COORDINATE - 1)
+    ends = np.clip(np.maximum(ends, starts + 1), 1, MAX_BIN_COORDINATE)
+    start_bins = starts >> BIN_FIRST_SHIFT
+    end_bins = (ends - 1) >> BIN_FIRST_SHIFT
+    bins = np.zeros(len(starts), dtype=np.int64)
+    assigned = np.zeros(len(starts), dtype=bool)
+    for offset in BIN_OFFSETS:
+        fits = (start_bins == end_bins) & ~assigned
+        bins[fits] = offset + start_bins[fits]
+        assigned |= fits
+        start_bins >>= BIN_NEXT_SHIFT
+        end_bins >>= BIN_NEXT_SHIFT
+    return bins
+
+
+def build_region_index(
+    codes: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    keys = region_key(codes, region_bins(starts, ends), starts)
+    rows = np.argsort(keys, kind="stable")
+    return keys[rows], rows
+
+
+def lookup_region(
+    keys: np.ndarray,
+    rows: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    code: int,
+    region: Region,
+) -> np.ndarray:
+    candidates = []
+    for low, high in overlapping_bins(region.start, region.end):
+        first = np.searchsorted(keys, region_key(code, low, 0), side="left")
+        last = np.searchsorted(
+            keys, region_key(code, high, min(region.end, KEY_MAX_START)), side="left"
+        )
+        candidates.append(rows[first:last])
+    candidates = np.sort(np.concatenate(candidates)) if candidates else rows[:0]
+    overlapping = (starts[candidates] < region.end) & (ends[candidates] > region.start)
+    return candidates[overlapping]
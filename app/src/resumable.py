@@ -0,0 +1,216 @@
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import IO, Iterator
+from flask import g
+from sqlalchemy import update
+from .. import db
+from .database import File, UploadSession
+from .jobs import COPY_BUFFER_SIZE, upload_queue
+from .util import (
+    decompress_stream,
+    ingest_fileStream,
+    parse_lines,
+    split_compression,
+    validate_file_content,
+)
+
+# Longest line accepted, also bounding the unfinished line carried to a part
+MAX_LINE_BYTES = 64 * 1024
+
+
+class PartLines:
+    # Yields the complete lines of a part, the unfinished last line joined to the
+    # tail of the previous part, and copies their bytes to the part's spool
+    def __init__(
+        self, upload: UploadSession, stream: IO[bytes], spool: IO[bytes], final: bool
+    ):
+        if isinstance(stream, io.RawIOBase):
+            stream = io.BufferedReader(stream)
+        self.stream = stream
+        self.spool = spool
+        self.final = final
+        self.tail = upload.tail
+        self.line_count = upload.line_count
+
+    def __iter__(self) -> Iterator[str]:
+        line = self.tail
+        while True:
+            piece = self.stream.readline(MAX_LINE_BYTES + 1)
+            line += piece
+            if len(line) > MAX_LINE_BYTES:
+                raise ValueError(
+                    f"Line {self.line_count + 1} is longer than {MAX_LINE_BYTES} bytes"
+                )
+            if not piece.endswith(b"\n"):
+                break
+            yield self.spooled(line)
+            line = b""
+        self.tail = line
+        if self.final and line:
+            self.tail = b""
+            yield self.spooled(line)
+
+    def spooled(self, line: bytes) -> str:
+        self.line_count += 1
+        try:
+            decoded = line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValueError(f"Line {self.line_count} is not valid UTF-8") from None
+        self.spool.write(line)
+        return decoded
+
+
+def part_path(upload: UploadSession, part_number: int) -> str:
+    return os.path.join(upload_queue.spool_path, f"{upload.id}.{part_number}")
+
+
+def validate_upload_target(filename: str, append: bool, user) -> str:
+    filename, _ = split_compression(filename)
+    existed_file = File.query.filter_by(filename=filename, user_id=user.id).first()
+    if append and existed_file is None:
+        return f"{filename} is not in the database"
+    if not append and existed_file is not None:
+        return f"{filename} is already in the database"
+    return ""
+
+
+def open_upload(
+    filename: str, user, content_encoding: str | None = None, append: bool = False
+) -> UploadSession:
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        filename=filename,
+        content_encoding=content_encoding,
+        append=append,
+        user_id=user.id,
+    )
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def ingest_part(
+    upload: UploadSession, part_number: int, data: bytes, final: bool = False
+) -> str:
+    if upload.status != "open":
+        return f"Upload {upload.id} is {upload.status}"
+    if part_number < upload.next_part:
+        # Sent again after an interruption: it is already spooled
+        return "ok"
+    if part_number > upload.next_part:
+        return f"Expected part {upload.next_part}"
+    started = time.perf_counter()
+    _, compression = split_compression(upload.filename, upload.content_encoding)
+    os.makedirs(upload_queue.spool_path, exist_ok=True)
+    spool = tempfile.NamedTemporaryFile(dir=upload_queue.spool_path, delete=False)
+    try:
+        with spool:
+            # Compressed parts are each a whole gzip member, bzip2 stream or zstd
+            # frame, decompressed and checked as they are read
+            lines = PartLines(
+                upload, decompress_stream(io.BytesIO(data), compression), spool, final
+            )
+            header, row_count = check_part_rows(upload, lines)
+    except ValueError as error:
+        os.remove(spool.name)
+        return f"Part {part_number}: {error}"
+    seconds = time.perf_counter() - started
+    claimed = db.session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id, UploadSession.next_part == part_number)
+        .values(
+            next_part=part_number + 1,
+            header=header,
+            tail=lines.tail,
+            line_count=lines.line_count,
+            row_count=UploadSession.row_count + row_count,
+            seconds=UploadSession.seconds + seconds,
+        )
+    ).rowcount
+    if not claimed:
+        # Another request for the same part got there first
+        db.session.rollback()
+        os.remove(spool.name)
+        return "ok"
+    os.replace(spool.name, part_path(upload, part_number))
+    db.session.commit()
+    return "ok"
+
+
+def check_part_rows(upload: UploadSession, lines: PartLines) -> tuple:
+    # (header, rows of the part), rows numbered from the top of the whole file
+    line_iterator = iter(lines)
+    header = upload.header
+    if header is None:
+        header = next(line_iterator, None)
+        if header is None:
+            return None, 0
+    file_content = parse_lines(
+        itertools.chain([header], line_iterator), lines.line_count + 1
+    )
+    status = validate_file_content(file_content)
+    if status != "":
+        raise ValueError(status)
+    return header, sum(len(chunk) for chunk in file_content[1])
+
+
+def join_parts(upload: UploadSession) -> str:
+    # The spooled parts in order are the decompressed upload, header included
+    path = os.path.join(upload_queue.spool_path, upload.id)
+    with open(path, "wb") as joined:
+        for part_number in range(1, upload.next_part):
+            with open(part_path(upload, part_number), "rb") as part:
+                shutil.copyfileobj(part, joined, COPY_BUFFER_SIZE)
+    for part_number in range(1, upload.next_part):
+        os.remove(part_path(upload, part_number))
+    return path
+
+
+def complete_upload(upload: UploadSession, user) -> str:
+    if upload.status != "open":
+        return f"Upload {upload.id} is {upload.status}"
+    # The last line may have no newline, it is checked with the header if need be
+    if upload.tail or upload.header is None:
+        status = ingest_part(upload, upload.next_part, b"", final=True)
+        if status != "ok":
+            return status
+    if upload.header is None:
+        return "Empty file"
+    # Ingested once as a whole, so summaries and top views are built once
+    filename, _ = split_compression(upload.filename, upload.content_encoding)
+    path = join_parts(upload)
+    if upload_queue.is_async:
+        upload.status = "done"
+        g.upload_job = upload_queue.enqueue_file(path, filename, user, upload.append)
+        return "ok"
+    try:
+        with open(path, "rb") as stream:
+            status = ingest_fileStream(stream, filename, user, None, upload.append)
+    finally:
+        os.remove(path)
+    # Set after the ingest, which rolls back to link a duplicate
+    if status != "ok":
+        upload.status = "failed"
+        db.session.commit()
+        return status
+    upload.status = "done"
+    upload.row_count = g.ingest_stats["rows"]
+    upload.seconds += g.ingest_stats["seconds"]
+    db.session.commit()
+    return "ok"
+
+
+def upload_status(upload: UploadSession) -> dict:
+    return {
+        "upload_id": upload.id,
+        "filename": split_compression(upload.filename, upload.content_encoding)[0],
+        "status": upload.status,
+        "next_part": upload.next_part,
+        "rows": upload.row_count,
+        "seconds": round(upload.seconds, 3),
+    }
@@ -0,0 +1,153 @@
+import base64
+import csv
+import io
+import json
+import math
+import operator
+from typing import Iterable, Iterator
+from .columnar import columnar_path, read_columnar
+from .query import fetch_after, keyset_source, region_filter, row_key
+from .region import Region
+from .table import COLUMN_NAMES
+from .topview import top_view_source
+
+STREAM_BATCH_SIZE = 5000
+MAX_PAGE_ROWS = 50000
+ROW_FORMATS: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "tsv": "text/tab-separated-values",
+}
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str | None) -> list | None:
+    if not cursor:
+        return None
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+class RowPager:
+    def __init__(
+        self,
+        file,
+        sort_by: str,
+        group_by: str,
+        show_top: int | None,
+        regions: dict[str, Region] | None = None,
+    ):
+        # regions maps side "1" and/or "2" to the region it must overlap
+        self.file = file
+        self.table = None
+        regions = regions or {}
+        # Stored views are paged in their stored rows on either backend
+        top_view = (
+            None if regions else top_view_source(file, sort_by, group_by, show_top)
+        )
+        if top_view is not None:
+            self.source, self.keys = top_view
+        elif file.storage == "columnar":
+            # Columnar files page by position in the sorted index order
+            table = read_columnar(columnar_path(file.data_id))
+            self.table = table
+            self.indices = table.view_indices(
+                sort_by,
+                group_by,
+                table.row_count if show_top is None else show_top,
+                table.region_subset(regions),
+            )
+        else:
+            filters = tuple(
+                region_filter(side, region) for side, region in regions.items()
+            )
+            self.source, self.keys = keyset_source(
+                file.data_id, sort_by, group_by, show_top, filters
+            )
+
+    @property
+    def is_columnar(self) -> bool:
+        # Paged by position in self.indices rather than by keyset
+        return self.table is not None
+
+    def check_cursor(self, cursor: list | None) -> None:
+        # Cursors come from clients, so each value must fit its key column
+        if cursor is None:
+            return
+        if self.is_columnar:
+            is_valid = len(cursor) == 1 and is_key_value(cursor[0], int, 0)
+        else:
+            is_valid = len(cursor) == len(self.keys) and all(
+                is_key_value(value, column.type.python_type)
+                for (column, _), value in zip(self.keys, cursor)
+            )
+        if not is_valid:
+            raise ValueError("Invalid cursor")
+
+    def fetch(self, cursor: list | None, limit: int) -> list:
+        if self.is_columnar:
+            offset = cursor[0] if cursor else 0
+            return self.table.rows(self.indices[offset : offset + limit])
+        return fetch_after(self.source, self.keys, cursor, limit)
+
+    def next_cursor(self, cursor: list | None, rows: list) -> list:
+        if self.is_columnar:
+            return [(cursor[0] if cursor else 0) + len(rows)]
+        return row_key(rows[-1], self.keys)
+
+    def page(self, cursor: list | None, limit: int) -> tuple[list, str | None]:
+        rows = self.fetch(cursor, limit + 1)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(self.next_cursor(cursor, rows))
+
+    def batches(self, cursor: list | None) -> Iterator[list]:
+        # Constant memory: one STREAM_BATCH_SIZE keyset query at a time
+        while True:
+            rows = self.fetch(cursor, STREAM_BATCH_SIZE)
+            if rows:
+                yield rows
+            if len(rows) < STREAM_BATCH_SIZE:
+                return
+            cursor = self.next_cursor(cursor, rows)
+
+
+def is_key_value(value, key_type: type, minimum: int = -(2**63)) -> bool:
+    # Ints must fit a 64-bit column; a float key may be written as 2 for 2.0
+    if isinstance(value, bool):
+        return False
+    if key_type is int:
+        return isinstance(value, int) and minimum <= value < 2**63
+    if key_type is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, key_type)
+
+
+def format_rows(
+    batches: Iterable[list], row_format: str, columns: list[str] = COLUMN_NAMES
+) -> Iterator[str]:
+    # Rows are read by attribute, so extra columns such as keyset keys are left out
+    row_values = operator.attrgetter(*columns)
+    if row_format == "ndjson":
+        for rows in batches:
+            yield "".join(
+                json.dumps(dict(zip(columns, row_values(row)))) + "\n" for row in rows
+            )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(
+        buffer, delimiter="\t" if row_format == "tsv" else ",", lineterminator="\n"
+    )
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(map(row_values, rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,123 @@
+import numpy as np
+from sqlalchemy import insert, select
+from .. import db
+from .columnar import columnar_path, read_columnar
+from .database import Content, Summary
+from .query import GROUP_COLUMNS, GROUP_STAT_FIELDS, query_group_stats, region_filter
+from .region import Region
+
+SUMMARY_GROUPS: list[str] = ["---", *GROUP_COLUMNS]
+
+
+def compute_group_stats(
+    file,
+    group_by: str,
+    regions: dict[str, Region] | None = None,
+    appended_after: int | None = None,
+) -> list[tuple]:
+    # One aggregation pass over the rows, SQL GROUP BY or NumPy reductions.
+    # appended_after limits it to rows past a row count (columnar) or a
+    # Content.id (SQL).
+    regions = regions or {}
+    if file.storage == "columnar":
+        table = read_columnar(columnar_path(file.data_id))
+        subset = table.region_subset(regions)
+        if appended_after is not None:
+            appended = np.arange(appended_after, table.row_count)
+            subset = appended if subset is None else np.intersect1d(subset, appended)
+        return table.group_stats(group_by, subset)
+    filters = tuple(region_filter(side, region) for side, region in regions.items())
+    if appended_after is not None:
+        filters += (Content.id > appended_after,)
+    return query_group_stats(file.data_id, group_by, filters)
+
+
+def store_file_summary(file) -> None:
+    for group_by in SUMMARY_GROUPS:
+        summaries = [
+            {
+                "file_id": file.data_id,
+                "group_by": group_by,
+                "value": value,
+                "rank": rank,
+                **dict(zip(GROUP_STAT_FIELDS, stats)),
+            }
+            for value, rank, *stats in compute_group_stats(file, group_by)
+        ]
+        if summaries:
+            db.session.execute(insert(Summary.__table__), summaries)
+
+
+def update_file_summary(file, appended_after: int) -> None:
+    # Folds the statistics of appended rows into the stored summaries
+    if Summary.query.filter_by(file_id=file.data_id).first() is None:
+        return
+    for group_by in SUMMARY_GROUPS:
+        summaries = {
+            summary.value: summary
+            for summary in Summary.query.filter_by(
+                file_id=file.data_id, group_by=group_by
+            )
+        }
+        stats = compute_group_stats(file, group_by, appended_after=appended_after)
+        for value, rank, *values in stats:
+            summary = summaries.get(value)
+            if summary is None:
+                db.session.add(
+                    Summary(
+                        file_id=file.data_id,
+                        group_by=group_by,
+                        value=value,
+                        rank=rank,
+                        **dict(zip(GROUP_STAT_FIELDS, values)),
+                    )
+                )
+                continue
+            for field, amount in zip(GROUP_STAT_FIELDS, values):
+                current = getattr(summary, field)
+                if field.endswith("_min"):
+                    amount = min(current, amount)
+                elif field.endswith("_max"):
+                    amount = max(current, amount)
+                else:
+                    amount = current + amount
+                setattr(summary, field, amount)
+
+
+def read_file_summary(file, group_by: str) -> list[tuple]:
+    statement = (
+        select(
+            Summary.value,
+            Summary.rank,
+            *[getattr(Summary, field) for field in GROUP_STAT_FIELDS],
+        )
+        .where(Summary.file_id == file.data_id, Summary.group_by == group_by)
+        .order_by(Summary.rank, Summary.value)
+    )
+    stats = [tuple(row) for row in db.session.execute(statement)]
+    if not stats and file.row_count:
+        # Files uploaded before summaries existed are summarised on first read
+        store_file_summary(file)
+        db.session.commit()
+        stats = [tuple(row) for row in db.session.execute(statement)]
+    return stats
+
+
+def summary_records(stats: list[tuple]) -> list[dict]:
+    records = []
+    for value, _, count, score_sum, score_min, score_max, *spans in stats:
+        span1_sum, span1_max, span2_sum, span2_max = spans
+        records.append(
+            {
+                "group": value,
+                "count": count,
+                "score_mean": score_sum / count,
+                "score_min": score_min,
+                "score_max": score_max,
+                "span1_mean": span1_sum / count,
+                "span1_max": span1_max,
+                "span2_mean": span2_sum / count,
+                "span2_max": span2_max,
+            }
+        )
+    return records
@@ -0,0 +1,218 @@
+from collections import namedtuple
+from typing import Callable
+import numpy as np
+from sqlalchemy import select
+from .. import db
+from .database import Content
+from .query import VIEW_COLUMNS, chrom_rank, sample_rank
+from .region import Region, lookup_region
+
+COLUMN_NAMES: list[str] = [column.key for column in VIEW_COLUMNS]
+COLUMN_DTYPES: dict[str, type] = {
+    "chrom1": str,
+    "start1": np.int64,
+    "end1": np.int64,
+    "chrom2": str,
+    "start2": np.int64,
+    "end2": np.int64,
+    "sample": str,
+    "score": np.float64,
+}
+# Columns sorted ascending by their natural rank, the rest sort descending
+RANKED_COLUMNS: dict[str, Callable[[str], int]] = {
+    "chrom1": chrom_rank,
+    "chrom2": chrom_rank,
+    "sample": sample_rank,
+}
+
+ViewRow = namedtuple("ViewRow", COLUMN_NAMES)
+
+
+class ColumnTable:
+    def __init__(
+        self,
+        columns: dict[str, np.ndarray],
+        dictionaries: dict[str, np.ndarray],
+        indexes: dict[str, np.ndarray] | None = None,
+    ):
+        # chrom1, chrom2 and sample hold integer codes into their dictionaries
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.indexes = indexes or {}
+        self.row_count = len(columns["score"])
+        self._ranks = {}
+        self._codes = {}
+        self._group_keys = {}
+
+    @classmethod
+    def from_rows(cls, rows) -> "ColumnTable":
+        values = list(zip(*rows)) or [[] for _ in COLUMN_NAMES]
+        columns = {}
+        dictionaries = {}
+        for name, column in zip(COLUMN_NAMES, values):
+            if name in RANKED_COLUMNS:
+                dictionaries[name], columns[name] = np.unique(
+                    np.array(column, dtype=str), return_inverse=True
+                )
+            else:
+                columns[name] = np.array(column, dtype=COLUMN_DTYPES[name])
+        return cls(columns, dictionaries)
+
+    def ranks(self, name: str) -> np.ndarray:
+        # Rank each distinct value once, then broadcast through the codes
+        if name not in self._ranks:
+            rank = RANKED_COLUMNS[name]
+            dictionary_ranks = np.array(
+                [rank(value) for value in self.dictionaries[name]], dtype=np.int64
+            )
+            self._ranks[name] = dictionary_ranks[self.columns[name]]
+        return self._ranks[name]
+
+    def codes(self, name: str) -> np.ndarray:
+        # Codes renumbered to follow the string order of the dictionary
+        if name not in self._codes:
+            dictionary = self.dictionaries[name]
+            string_order = np.empty(len(dictionary), dtype=np.int64)
+            string_order[np.argsort(dictionary, kind="stable")] = np.arange(
+                len(dictionary)
+            )
+            self._codes[name] = string_order[self.columns[name]]
+        return self._codes[name]
+
+    def sort_order(self, sort_by: str, subset: np.ndarray | None = None) -> np.ndarray:
+        # Stable sorts keep upload order between equal keys, like ORDER BY ..., id
+        if subset is None:
+            subset = np.arange(self.row_count)
+        if sort_by in RANKED_COLUMNS:
+            return subset[np.argsort(self.ranks(sort_by)[subset], kind="stable")]
+        if sort_by in COLUMN_NAMES:
+            return subset[np.argsort(-self.columns[sort_by][subset], kind="stable")]
+        return subset
+
+    def view_indices(
+        self,
+        sort_by: str,
+        group_by: str,
+        show_top: int,
+        subset: np.ndarray | None = None,
+    ) -> np.ndarray:
+        order = self.sort_order(sort_by, subset)
+        if group_by not in RANKED_COLUMNS:
+            return order[:show_top]
+        grouped, position_in_group = self.regroup(order, group_by)
+        return grouped[position_in_group < show_top]
+
+    def group_keys(self, name: str) -> np.ndarray:
+        # One small integer per row, ordered like (rank, value), so grouping is
+        # a single stable radix sort instead of a lexsort over two keys
+        if name not in self._group_keys:
+            dictionary = self.dictionaries[name]
+            rank = RANKED_COLUMNS[name]
+            dictionary_ranks = [rank(value) for value in dictionary.tolist()]
+            dtype = np.uint16 if len(dictionary) <= 65536 else np.int64
+            keys = np.empty(len(dictionary), dtype=dtype)
+            keys[np.lexsort((dictionary, dictionary_ranks))] = np.arange(
+                len(dictionary)
+            )
+            self._group_keys[name] = keys[self.columns[name]]
+        return self._group_keys[name]
+
+    def regroup(
+        self, order: np.ndarray, group_by: str
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Stable regroup of a sorted order, with each row's position in its group
+        keys = self.group_keys(group_by)
+        grouped = order[np.argsort(keys[order], kind="stable")]
+        keys = keys[grouped]
+        group_starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(keys)])
+        position_in_group = np.arange(len(keys)) - np.repeat(group_starts, group_sizes)
+        return grouped, position_in_group
+
+    def region_rows(self, side: str, region: Region) -> np.ndarray:
+        # Ascending row numbers whose side 1 or 2 interval overlaps the region
+        codes = np.flatnonzero(self.dictionaries[f"chrom{side}"] == region.chrom)
+        starts = self.columns[f"start{side}"]
+        ends = self.columns[f"end{side}"]
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+        if f"region{side}_keys" in self.indexes:
+            return lookup_region(
+                self.indexes[f"region{side}_keys"],
+                self.indexes[f"region{side}_rows"],
+                starts,
+                ends,
+                int(codes[0]),
+                region,
+            )
+        overlapping = (
+            (self.columns[f"chrom{side}"] == codes[0])
+            & (starts < region.end)
+            & (ends > region.start)
+        )
+        return np.flatnonzero(overlapping)
+
+    def region_subset(self, regions: dict[str, Region]) -> np.ndarray | None:
+        # Rows overlapping every given region, None when there is no region
+        subset = None
+        for side, region in regions.items():
+            rows = self.region_rows(side, region)
+            subset = rows if subset is None else np.intersect1d(subset, rows)
+        return subset
+
+    def group_stats(
+        self, group_by: str, subset: np.ndarray | None = None
+    ) -> list[tuple]:
+        # Same rows as query_group_stats, reduced over contiguous group runs
+        if subset is None:
+            subset = np.arange(self.row_count)
+        if len(subset) == 0:
+            return []
+        if group_by in RANKED_COLUMNS:
+            codes = self.codes(group_by)
+            ranks = self.ranks(group_by)
+            subset = subset[np.lexsort((codes[subset], ranks[subset]))]
+            group_codes = codes[subset]
+            group_starts = np.flatnonzero(
+                np.r_[True, group_codes[1:] != group_codes[:-1]]
+            )
+            first_rows = subset[group_starts]
+            values = self.dictionaries[group_by][self.columns[group_by][first_rows]]
+            groups = zip(values.tolist(), ranks[first_rows].tolist())
+        else:
+            group_starts = np.array([0])
+            groups = [(None, None)]
+        score = self.columns["score"][subset]
+        span1 = self.columns["end1"][subset] - self.columns["start1"][subset]
+        span2 = self.columns["end2"][subset] - self.columns["start2"][subset]
+        stats = [
+            np.diff(np.r_[group_starts, len(subset)]),
+            np.add.reduceat(score, group_starts),
+            np.minimum.reduceat(score, group_starts),
+            np.maximum.reduceat(score, group_starts),
+            np.add.reduceat(span1, group_starts),
+            np.maximum.reduceat(span1, group_starts),
+            np.add.reduceat(span2, group_starts),
+            np.maximum.reduceat(span2, group_starts),
+        ]
+        columns = [stat.tolist() for stat in stats]
+        return [(*group, *row) for group, row in zip(groups, zip(*columns))]
+
+    def rows(self, indices: np.ndarray | slice) -> list[ViewRow]:
+        values = []
+        for name in COLUMN_NAMES:
+            column = self.columns[name][indices]
+            if name in self.dictionaries:
+                column = self.dictionaries[name][column]
+            values.append(column.tolist())
+        return [ViewRow(*row) for row in zip(*values)]
+
+    def view(self, sort_by: str, group_by: str, show_top: int) -> list[ViewRow]:
+        return self.rows(self.view_indices(sort_by, group_by, show_top))
+
+
+def load_table(file_id: int) -> ColumnTable:
+    statement = (
+        select(*VIEW_COLUMNS).where(Content.file_id == file_id).order_by(Content.id)
+    )
+    return ColumnTable.from_rows(db.session.execute(statement))
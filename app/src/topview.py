@@ -0,0 +1,226 @@
+from typing import Iterable, Iterator
+import numpy as np
+from sqlalchemy import Subquery, delete, insert, select
+from .. import db
+from .columnar import columnar_path, read_columnar
+from .database import Content, TopRow
+from .query import GROUP_COLUMNS, SORT_KEYS, VIEW_COLUMNS
+from .table import COLUMN_NAMES, RANKED_COLUMNS, ColumnTable
+
+# The largest show_top of the homepage, so every view it shows can be stored
+TOP_VIEW_ROWS = 20
+TOP_VIEW_SORTS: list[str] = ["---", *SORT_KEYS]
+TOP_VIEW_GROUPS: list[str] = ["---", *GROUP_COLUMNS]
+# Rows of a SQL file folded into its top views at a time
+TOP_VIEW_BLOCK_ROWS = 200_000
+
+View = tuple[str, str]  # (sort_by, group_by)
+
+
+def view_heads(table: ColumnTable, views: list[View]) -> Iterator[tuple]:
+    # (sort_by, group_by, row indices in view order, their row numbers in group)
+    orders = {}
+    for sort_by, group_by in views:
+        if sort_by not in orders:
+            orders[sort_by] = table.sort_order(sort_by)
+        order = orders[sort_by]
+        if group_by not in RANKED_COLUMNS:
+            heads = order[:TOP_VIEW_ROWS]
+            yield sort_by, group_by, heads, np.arange(1, len(heads) + 1)
+            continue
+        grouped, position_in_group = table.regroup(order, group_by)
+        is_head = position_in_group < TOP_VIEW_ROWS
+        yield sort_by, group_by, grouped[is_head], position_in_group[is_head] + 1
+
+
+class TopViewBuilder:
+    # Folds blocks of rows, in upload order, into the rows heading some of the
+    # views. A row behind TOP_VIEW_ROWS others of its group stays behind them
+    # however many rows follow, so the candidates kept are the heads of the
+    # views: TOP_VIEW_ROWS rows per group of each view. That grows with the
+    # number of groups, not rows, plus the TOP_VIEW_BLOCK_ROWS block being
+    # folded.
+    def __init__(
+        self, views: list[View], rows: Iterable = (), row_indexes: Iterable[int] = ()
+    ):
+        self.views = views
+        self.rows: list = list(rows)
+        self.row_indexes: list[int] = list(row_indexes)
+
+    def fold(self, rows: list, first_index: int) -> None:
+        row_indexes = self.row_indexes + list(
+            range(first_index, first_index + len(rows))
+        )
+        rows = self.rows + rows
+        views = view_heads(ColumnTable.from_rows(rows), self.views)
+        heads = np.unique(np.concatenate([indices for _, _, indices, _ in views]))
+        self.rows = [rows[index] for index in heads.tolist()]
+        self.row_indexes = [row_indexes[index] for index in heads.tolist()]
+
+    def table(self) -> tuple[ColumnTable, np.ndarray]:
+        return ColumnTable.from_rows(self.rows), np.array(
+            self.row_indexes, dtype=np.int64
+        )
+
+
+def store_top_view(file, sort_by: str, group_by: str) -> None:
+    # Each view is stored on its first request rather than every view at
+    # ingest, which wrote far more rows than most files are ever shown
+    views = [(sort_by, group_by)]
+    db.session.execute(
+        delete(TopRow).where(
+            TopRow.file_id == file.data_id,
+            TopRow.sort_by == sort_by,
+            TopRow.group_by == group_by,
+        )
+    )
+    if file.storage == "columnar":
+        # Computed straight from the memory-mapped columns
+        table = read_columnar(columnar_path(file.data_id))
+        write_top_views(file, views, table, np.arange(table.row_count))
+        return
+    statement = (
+        select(*VIEW_COLUMNS)
+        .where(Content.file_id == file.data_id)
+        .order_by(Content.id)
+    )
+    write_top_views(file, views, *fold_rows(TopViewBuilder(views), statement, 0))
+
+
+def stored_views(file) -> list[View]:
+    statement = (
+        select(TopRow.sort_by, TopRow.group_by)
+        .where(TopRow.file_id == file.data_id)
+        .distinct()
+    )
+    return [tuple(view) for view in db.session.execute(statement)]
+
+
+def update_top_views(file, appended_after: int) -> None:
+    # Runs before file.row_count counts the appended rows
+    views = stored_views(file)
+    if not views:
+        return
+    # New heads are old heads or appended rows, so the file is not read again
+    stored = db.session.execute(
+        select(TopRow.row_index, *[getattr(TopRow, name) for name in COLUMN_NAMES])
+        .where(TopRow.file_id == file.data_id)
+        .distinct()
+        .order_by(TopRow.row_index)
+    ).all()
+    builder = TopViewBuilder(
+        views, [tuple(row[1:]) for row in stored], [row.row_index for row in stored]
+    )
+    if file.storage == "columnar":
+        # Read from the rewritten file, whose rows start with the old ones
+        appended = read_columnar(columnar_path(file.data_id))
+        for start in range(appended_after, appended.row_count, TOP_VIEW_BLOCK_ROWS):
+            rows = appended.rows(slice(start, start + TOP_VIEW_BLOCK_ROWS))
+            builder.fold([tuple(row) for row in rows], start)
+        table, row_indexes = builder.table()
+    else:
+        statement = (
+            select(*VIEW_COLUMNS)
+            .where(Content.file_id == file.data_id, Content.id > appended_after)
+            .order_by(Content.id)
+        )
+        table, row_indexes = fold_rows(builder, statement, file.row_count)
+    db.session.execute(delete(TopRow).where(TopRow.file_id == file.data_id))
+    write_top_views(file, views, table, row_indexes)
+
+
+def fold_rows(
+    builder: TopViewBuilder, statement, first_index: int
+) -> tuple[ColumnTable, np.ndarray]:
+    connection = db.session.connection().execution_options(
+        yield_per=TOP_VIEW_BLOCK_ROWS
+    )
+    for rows in connection.execute(statement).partitions():
+        builder.fold([tuple(row) for row in rows], first_index)
+        first_index += len(rows)
+    return builder.table()
+
+
+def write_top_views(
+    file, views: list[View], table: ColumnTable, row_indexes: np.ndarray
+) -> None:
+    if table.row_count == 0:
+        return
+    records = []
+    for sort_by, group_by, indices, row_numbers in view_heads(table, views):
+        rows = zip(
+            table.rows(indices), row_numbers.tolist(), row_indexes[indices].tolist()
+        )
+        for position, (row, row_number, row_index) in enumerate(rows):
+            records.append(
+                {
+                    "file_id": file.data_id,
+                    "sort_by": sort_by,
+                    "group_by": group_by,
+                    "position": position,
+                    "row_number": row_number,
+                    "row_index": row_index,
+                    **row._asdict(),
+                }
+            )
+    db.session.execute(insert(TopRow.__table__), records)
+
+
+def is_stored_view(sort_by: str, group_by: str, show_top: int | None) -> bool:
+    return (
+        show_top is not None
+        and 1 <= show_top <= TOP_VIEW_ROWS
+        and sort_by in TOP_VIEW_SORTS
+        and group_by in TOP_VIEW_GROUPS
+    )
+
+
+def ensure_top_view(file, sort_by: str, group_by: str) -> None:
+    stored = TopRow.query.filter_by(
+        file_id=file.data_id, sort_by=sort_by, group_by=group_by
+    ).first()
+    if stored is None and file.row_count:
+        store_top_view(file, sort_by, group_by)
+        db.session.commit()
+
+
+def read_top_view(file, sort_by: str, group_by: str, show_top: int) -> list | None:
+    # None for views that are not stored, which are computed as before
+    if not is_stored_view(sort_by, group_by, show_top):
+        return None
+    ensure_top_view(file, sort_by, group_by)
+    statement = (
+        select(*[getattr(TopRow, name) for name in COLUMN_NAMES])
+        .where(
+            TopRow.file_id == file.data_id,
+            TopRow.sort_by == sort_by,
+            TopRow.group_by == group_by,
+            TopRow.row_number <= show_top,
+        )
+        .order_by(TopRow.position)
+    )
+    return db.session.execute(statement).all()
+
+
+def top_view_source(
+    file, sort_by: str, group_by: str, show_top: int | None
+) -> tuple[Subquery, list] | None:
+    # Like query.keyset_source for a stored view, keyed by its position, so a
+    # page seeks within the view instead of numbering every row of the file
+    if not is_stored_view(sort_by, group_by, show_top):
+        return None
+    ensure_top_view(file, sort_by, group_by)
+    source = (
+        select(
+            *[getattr(TopRow, name) for name in COLUMN_NAMES],
+            TopRow.position.label("key0"),
+        )
+        .where(
+            TopRow.file_id == file.data_id,
+            TopRow.sort_by == sort_by,
+            TopRow.group_by == group_by,
+            TopRow.row_number <= show_top,
+        )
+        .subquery()
+    )
+    return source, [(source.c.key0, False)]
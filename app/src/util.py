@@ -1,141 +1,627 @@
+import bz2
 import codecs
-from flask import request
+import gzip
+import hashlib
+import io
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Iterable, Iterator
+from flask import current_app, g, request
 from flask_login import current_user, login_required, login_user
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.datastructures import Authorization
 from werkzeug.datastructures.file_storage import FileStorage
+from sqlalchemy import func, insert, select, text
 from .. import db
+from .auth import token_signer
+from .cache import view_cache
+from .columnar import (
+    append_columnar,
+    columnar_path,
+    copy_columnar,
+    read_columnar,
+    remove_columnar,
+    write_columnar,
+)
+from .merge import merge_views
+from .metrics import instrumentation
+from .parsepool import parse_pool
+from .query import query_file_view, sort_key_values
+from .region import region_bin
+from .summary import store_file_summary, update_file_summary
+from .table import COLUMN_NAMES, load_table
+from .topview import read_top_view, update_top_views
+from .validation import convert_rows, row_error_report
+
+try:
+    import zstandard
+except ImportError:  # zstd uploads are refused without the optional package
+    zstandard = None
 
 
 # File validation
 
 ALLOWED_EXTENSIONS: set[str] = set(["csv", "tsv"])
-MANDATORY_COLUMNS: list[str] = [
-    "chrom1",
-    "start1",
-    "end1",
-    "chrom2",
-    "end2",
-    "sample",
-    "score",
-]
+DELIMITERS: list[str] = [",", "\t"]
+HASH_BLOCK_SIZE = 1024 * 1024
+COMPRESSION_EXTENSIONS: dict[str, str] = {"gz": "gzip", "bz2": "bzip2", "zst": "zstd"}
+CONTENT_ENCODINGS: dict[str, str | None] = {
+    "identity": None,
+    "gzip": "gzip",
+    "x-gzip": "gzip",
+    "bzip2": "bzip2",
+    "x-bzip2": "bzip2",
+    "zstd": "zstd",
+}
+
+# Header row and a generator of typed row chunks
+ParsedFile = tuple[list[str], Iterator[list[tuple]]]
 
 
 def validate_filename(filename: str) -> str:
+    filename, _ = split_compression(filename)
     if not (
         "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
     ):
-        return f'Invalid file type: {filename.split(".")[1]}'
+        return f'Invalid file type: {filename.rsplit(".", 1)[-1]}'
     return ""
 
 
-def parse_fileStorage(file: FileStorage) -> list[list[str]] | None:
-    stream = codecs.iterdecode(file.stream, "utf-8")
-    csv_content = try_parse(stream, ",")
-    if csv_content:
-        return csv_content
-    else:
-        tsv_content = try_parse(stream, "\t")
-        if tsv_content:
-            return tsv_content
+def split_compression(
+    filename: str, content_encoding: str | None = None
+) -> tuple[str, str | None]:
+    # "example.csv.gz" -> ("example.csv", "gzip"), Content-Encoding wins over it
+    base, _, extension = filename.rpartition(".")
+    compression = None
+    if base and extension.lower() in COMPRESSION_EXTENSIONS:
+        filename, compression = base, COMPRESSION_EXTENSIONS[extension.lower()]
+    if content_encoding:
+        encoding = content_encoding.strip().lower()
+        compression = CONTENT_ENCODINGS.get(encoding, encoding)
+    return filename, compression
+
+
+def validate_compression(compression: str | None) -> str:
+    if compression == "zstd" and zstandard is None:
+        return "zstd uploads need the zstandard package"
+    if compression not in (None, *COMPRESSION_EXTENSIONS.values()):
+        return f"Unsupported Content-Encoding: {compression}"
+    return ""
+
+
+class DecompressedReader(io.RawIOBase):
+    # Decompresses an upload as it is read, corrupt data fails like a bad row
+    def __init__(self, stream: IO[bytes], compression: str):
+        self.compression = compression
+        if compression == "gzip":
+            self.reader = gzip.GzipFile(fileobj=stream, mode="rb")
+        elif compression == "bzip2":
+            self.reader = bz2.BZ2File(stream)
         else:
-            return None
+            self.reader = zstandard.ZstdDecompressor().stream_reader(
+                stream, read_across_frames=True, closefd=False
+            )
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        try:
+            data = self.reader.read(len(buffer))
+        except Exception as error:
+            raise ValueError(f"Invalid {self.compression} data") from error
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def decompress_stream(stream: IO[bytes], compression: str | None) -> IO[bytes]:
+    if compression is None:
+        return stream
+    return DecompressedReader(stream, compression)
+
+
+def parse_fileStorage(
+    file: FileStorage, compression: str | None = None, content_hash=None
+) -> ParsedFile | None:
+    stream = decompress_stream(file.stream, compression)
+    if content_hash is not None:
+        stream = HashingReader(stream, content_hash)
+    return parse_lines(decode_lines(stream))
+
+
+def parse_fileString(file_string: str) -> ParsedFile | None:
+    return parse_lines(io.StringIO(file_string.strip()))
+
+
+def decode_lines(stream: IO[bytes]) -> Iterator[str]:
+    if isinstance(stream, io.RawIOBase):
+        # Raw request streams would otherwise be read byte by byte per line
+        stream = io.BufferedReader(stream)
+    return codecs.iterdecode(stream, "utf-8")
+
+
+class HashingReader(io.RawIOBase):
+    # Feeds every byte the parser reads from an upload into its content hash,
+    # the SHA-256 of the decompressed bytes so a compressed copy is a duplicate
+    def __init__(self, stream: IO[bytes], content_hash):
+        self.stream = stream
+        self.content_hash = content_hash
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(len(buffer))
+        buffer[: len(data)] = data
+        self.content_hash.update(data)
+        return len(data)
+
+
+def hash_before_parse(stream: IO[bytes], compression: str | None):
+    # A seekable upload, spooled or in memory, is hashed in a read of its own
+    # so a duplicate is linked without being parsed. None for a stream that can
+    # only be read once, which is hashed by a HashingReader as it is parsed.
+    if not stream.seekable():
+        return None
+    start = stream.tell()
+    content_hash = hashlib.sha256()
+    reader = decompress_stream(stream, compression)
+    while block := reader.read(HASH_BLOCK_SIZE):
+        content_hash.update(block)
+    stream.seek(start)
+    return content_hash
+
+
+def sniff_delimiter(header_line: str) -> str | None:
+    for sep in DELIMITERS:
+        if len(header_line.split(sep)) > 1:
+            return sep
+    return None
+
+
+def parse_lines(lines: Iterable[str], first_row: int = 2) -> ParsedFile | None:
+    # first_row numbers the line after the header in error messages
+    lines = iter(lines)
+    header_line = next(lines, "")
+    sep = sniff_delimiter(header_line)
+    if sep is None:
+        return None
+    headers = header_line.strip().split(sep)
+    return headers, iter_row_chunks(
+        lines, sep, headers, current_app.config["INGEST_BATCH_SIZE"], first_row
+    )
 
 
-def parse_fileString(file_string: str) -> list[list[str]] | None:
-    lines = file_string.strip().split("\n")
-    csv_content = try_parse(lines, ",")
-    if csv_content is not None:
-        return csv_content
-    else:
-        tsv_content = try_parse(lines, "\t")
-        return tsv_content
+def iter_row_chunks(
+    lines: Iterator[str],
+    sep: str,
+    headers: list[str],
+    chunk_size: int,
+    first_row: int = 2,
+) -> Iterator[list[tuple]]:
+    # Each chunk is converted and validated whole before it is yielded
+    chunk = []
+    row_numbers = []
+    for row_number, line in enumerate(lines, start=first_row):
+        line = line.strip()
+        if line == "":
+            continue
+        chunk.append(line)
+        row_numbers.append(row_number)
+        if len(chunk) == chunk_size:
+            yield convert_rows(chunk, sep, row_numbers, headers)
+            chunk = []
+            row_numbers = []
+    if chunk:
+        yield convert_rows(chunk, sep, row_numbers, headers)
+
+
+def parse_filePath(path: str, header_line: str) -> ParsedFile | None:
+    sep = sniff_delimiter(header_line)
+    if sep is None:
+        return None
+    headers = header_line.strip().split(sep)
+    data_start = len(header_line.encode("utf-8"))
+    return headers, iter_parallel_row_chunks(path, data_start, sep, headers)
+
+
+def is_parallel_parse(stream: IO[bytes]) -> bool:
+    path = getattr(stream, "name", None)
+    return (
+        isinstance(path, str)
+        and parse_pool.workers > 1
+        and os.path.getsize(path) >= current_app.config["PARALLEL_PARSE_MIN_BYTES"]
+    )
 
 
-def try_parse(stream, sep=",") -> list[list[str]] | None:
-    rows = []
-    for row in stream:
-        splitted_row = row.strip().split(sep)
-        if len(splitted_row) == 1:
-            return None
-        rows.append(splitted_row)
-    return rows
+def split_at_newlines(path: str, start: int, chunk_bytes: int) -> list[tuple]:
+    size = os.path.getsize(path)
+    byte_ranges = []
+    with open(path, "rb") as file:
+        while start < size:
+            end = start + chunk_bytes
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            end = min(end, size)
+            byte_ranges.append((start, end))
+            start = end
+    return byte_ranges
+
+
+def parse_byte_range(
+    path: str, start: int, end: int, sep: str, headers: list[str], chunk_size: int
+) -> tuple:
+    # Runs in a worker process: (row chunks, line count, None), or for an invalid
+    # chunk (None, line count, (its lines, their line indexes in the range))
+    with open(path, "rb") as file:
+        file.seek(start)
+        lines = file.read(end - start).decode("utf-8").splitlines()
+    row_lines = []
+    line_indexes = []
+    for line_index, line in enumerate(lines):
+        line = line.strip()
+        if line != "":
+            row_lines.append(line)
+            line_indexes.append(line_index)
+    chunks = []
+    for chunk_start in range(0, len(row_lines), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        try:
+            chunks.append(
+                convert_rows(row_lines[chunk], sep, line_indexes[chunk], headers)
+            )
+        except ValueError:
+            return None, len(lines), (row_lines[chunk], line_indexes[chunk])
+    return chunks, len(lines), None
+
+
+def iter_parallel_row_chunks(
+    path: str, start: int, sep: str, headers: list[str]
+) -> Iterator[list[tuple]]:
+    config = current_app.config
+    chunk_size = config["INGEST_BATCH_SIZE"]
+    workers = parse_pool.workers
+    byte_ranges = iter(split_at_newlines(path, start, config["PARSE_CHUNK_BYTES"]))
+    executor = parse_pool.get()
+
+    def submit(byte_range: tuple):
+        return executor.submit(
+            parse_byte_range, path, *byte_range, sep, headers, chunk_size
+        )
+
+    pending = deque()
+    try:
+        # Keep a bounded window of ranges in flight and merge them in file order
+        pending.extend(
+            submit(byte_range)
+            for byte_range in itertools.islice(byte_ranges, workers * 2)
+        )
+        row_number = 2
+        while pending:
+            chunks, line_count, invalid_chunk = pending.popleft().result()
+            byte_range = next(byte_ranges, None)
+            if byte_range is not None:
+                pending.append(submit(byte_range))
+            if chunks is None:
+                # Reported with row numbers counted from the top of the file
+                invalid_lines, line_indexes = invalid_chunk
+                row_numbers = [row_number + i for i in line_indexes]
+                raise ValueError(
+                    row_error_report(invalid_lines, sep, row_numbers, headers)
+                )
+            row_number += line_count
+            yield from chunks
+    except BrokenProcessPool:
+        parse_pool.discard(executor)
+        raise
+    finally:
+        # The pool outlives the upload, only its remaining ranges are dropped
+        for future in pending:
+            future.cancel()
 
 
 def has_mandatory_columns(headers: list[str]) -> str:
-    for title in MANDATORY_COLUMNS:
+    for title in COLUMN_NAMES:
         if title not in headers:
             return f"Missing mandatory column: {title}"
     return ""
 
 
-def validate_file_content(file_content: list[list[str]] | None) -> str:
+def validate_file_content(file_content: ParsedFile | None) -> str:
     if file_content is None:
         return "File is not in csv or tsv format"
     header_validation = has_mandatory_columns(file_content[0])
     if header_validation != "":
         return header_validation
+    # Fields are matched to columns by header name, so with every mandatory
+    # column present and no other, the header is the columns in some order
+    if len(file_content[0]) != len(COLUMN_NAMES):
+        return (
+            f"Header has {len(file_content[0])} columns, "
+            f"expected {len(COLUMN_NAMES)}"
+        )
     return ""
 
 
-def write_file_to_database(filename, file_content) -> str:
-    from .database import File, Content
+def ingest_stats(row_count: int, seconds: float) -> dict:
+    return {
+        "rows": row_count,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(row_count / seconds) if seconds > 0 else row_count,
+    }
+
+
+def content_values(row: list, file_id: int) -> dict:
+    values = dict(zip(COLUMN_NAMES, row))
+    values.update(sort_key_values(values["chrom1"], values["chrom2"], values["sample"]))
+    values["bin1"] = region_bin(values["start1"], values["end1"])
+    values["bin2"] = region_bin(values["start2"], values["end2"])
+    values["file_id"] = file_id
+    return values
+
+
+def insert_contents(file_id: int, chunks) -> int:
+    from .database import Content
+
+    # One transaction per file, rows sent to SQLite in executemany batches
+    row_count = 0
+    for chunk in chunks:
+        batch = [content_values(row, file_id) for row in chunk]
+        db.session.execute(insert(Content.__table__), batch)
+        row_count += len(batch)
+    return row_count
+
+
+def write_file_to_database(
+    filename, file_content, user, content_hash=None, started: float | None = None
+) -> str:
+    from .database import File
 
-    existed_file = File.query.filter_by(
-        filename=filename, user_id=current_user.id
-    ).first()
+    existed_file = File.query.filter_by(filename=filename, user_id=user.id).first()
     if existed_file:
         return f"{filename} is already in the database"
-    new_file = File(filename=filename, user_id=current_user.id)
+    if started is None:
+        started = time.perf_counter()
+    storage = current_app.config["STORAGE_BACKEND"]
+    headers, chunks = file_content
+    new_file = File(
+        filename=filename, user_id=user.id, storage=storage, header=",".join(headers)
+    )
     db.session.add(new_file)
+    db.session.flush()
+    data_id = new_file.data_id = new_file.id
+    try:
+        if storage == "columnar":
+            new_file.row_count = write_columnar(data_id, chunks)
+        else:
+            new_file.row_count = insert_contents(data_id, chunks)
+    except ValueError as error:
+        db.session.rollback()
+        return str(error)
+    if content_hash is not None:
+        # Checked again for a stream hashed as it was parsed, or an identical
+        # upload written meanwhile
+        duplicate = find_duplicate(content_hash.hexdigest())
+        if duplicate is not None:
+            db.session.rollback()
+            if storage == "columnar":
+                remove_columnar(data_id)
+            return link_file_to_database(filename, duplicate, user, started)
+        new_file.content_hash = content_hash.hexdigest()
+    store_file_summary(new_file)
+    user.selected_file = filename
     db.session.commit()
-    current_user.selected_file = filename
-    for row in file_content[1:]:
-        [chrom1, start1, end1, chrom2, start2, end2, sample, score] = row
-        new_content = Content(
-            chrom1=chrom1,
-            start1=start1,
-            end1=end1,
-            chrom2=chrom2,
-            start2=start2,
-            end2=end2,
-            sample=sample,
-            score=score,
-            file_id=new_file.id,
-        )
-        db.session.add(new_content)
-        db.session.commit()
+    view_cache.invalidate_file(data_id)
+    g.ingest_stats = ingest_stats(new_file.row_count, time.perf_counter() - started)
+    return "ok"
+
+
+def find_duplicate(content_hash: str):
+    from .database import File
+
+    return File.query.filter_by(content_hash=content_hash).first()
+
+
+def link_file_to_database(filename, source, user, started: float) -> str:
+    from .database import File
+
+    # Same bytes as an earlier upload: a new File sharing the source's data.
+    # started is when the upload began to be read, hashing included.
+    existed_file = File.query.filter_by(filename=filename, user_id=user.id).first()
+    if existed_file:
+        return f"{filename} is already in the database"
+    new_file = File(
+        filename=filename,
+        user_id=user.id,
+        storage=source.storage,
+        row_count=source.row_count,
+        data_id=source.data_id,
+        content_hash=source.content_hash,
+        header=source.header,
+    )
+    db.session.add(new_file)
+    user.selected_file = filename
+    db.session.commit()
+    g.ingest_stats = ingest_stats(new_file.row_count, time.perf_counter() - started)
     return "ok"
 
 
+def append_file_to_database(filename, file_content, user) -> str:
+    from .database import Content, File
+
+    file = File.query.filter_by(filename=filename, user_id=user.id).first()
+    if file is None:
+        return f"{filename} is not in the database"
+    headers, chunks = file_content
+    if file.header is not None and headers != file.header.split(","):
+        return f"Header does not match {filename}: {file.header}"
+    started = time.perf_counter()
+    copied_to = unshare_file_data(file)
+    # Appended rows are those after the current row count or last Content.id
+    try:
+        if file.storage == "columnar":
+            appended_after = file.row_count
+            row_count = append_columnar(file.data_id, chunks)
+        else:
+            appended_after = db.session.execute(
+                select(func.max(Content.id)).where(Content.file_id == file.data_id)
+            ).scalar()
+            row_count = insert_contents(file.data_id, chunks)
+    except ValueError as error:
+        db.session.rollback()
+        if copied_to is not None and file.storage == "columnar":
+            remove_columnar(copied_to)
+        return str(error)
+    if appended_after is not None:
+        update_file_summary(file, appended_after)
+        update_top_views(file, appended_after)
+    file.row_count += row_count
+    file.content_hash = None
+    user.selected_file = filename
+    db.session.commit()
+    view_cache.invalidate_file(file.data_id)
+    g.ingest_stats = ingest_stats(row_count, time.perf_counter() - started)
+    return "ok"
+
+
+def unshare_file_data(file) -> int | None:
+    from .database import File
+
+    # Before file's data changes, the other files sharing it get their own copy
+    # under a free data_id: the id of the file that moves. Returns that id.
+    sharers = File.query.filter(
+        File.data_id == file.data_id, File.id != file.id
+    ).all()
+    if not sharers:
+        return None
+    moved = sharers if file.data_id == file.id else [file]
+    target_id = moved[0].id
+    copy_file_data(file.storage, file.data_id, target_id)
+    for moved_file in moved:
+        moved_file.data_id = target_id
+    return target_id
+
+
+def copy_file_data(storage: str, data_id: int, target_id: int) -> None:
+    from .database import Content, Summary, TopRow
+
+    copies = [Summary.__table__, TopRow.__table__]
+    if storage == "columnar":
+        copy_columnar(data_id, target_id)
+    else:
+        copies.append(Content.__table__)
+    for table in copies:
+        columns = [column.name for column in table.columns if column.name != "id"]
+        copied = ", ".join(
+            ":target_id" if column == "file_id" else column for column in columns
+        )
+        db.session.execute(
+            text(
+                f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                f"SELECT {copied} FROM {table.name} WHERE file_id = :data_id "
+                "ORDER BY id"
+            ),
+            {"data_id": data_id, "target_id": target_id},
+        )
+
+
 @login_required
 def validate_fileStorage(file: FileStorage) -> str:
     if not file or file.filename is None:
         return ""
-    filename = secure_filename(file.filename)
+    filename, compression = split_compression(secure_filename(file.filename))
     filename_validation = validate_filename(filename)
     if filename_validation != "":
         return filename_validation
-    file_content = parse_fileStorage(file)
+    compression_validation = validate_compression(compression)
+    if compression_validation != "":
+        return compression_validation
+    started = time.perf_counter()
+    try:
+        content_hash = hash_before_parse(file.stream, compression)
+        if content_hash is not None:
+            duplicate = find_duplicate(content_hash.hexdigest())
+            if duplicate is not None:
+                return link_file_to_database(filename, duplicate, current_user, started)
+            file_content = parse_fileStorage(file, compression)
+        else:
+            content_hash = hashlib.sha256()
+            file_content = parse_fileStorage(file, compression, content_hash)
+    except ValueError as error:
+        return str(error)
     file_content_validation = validate_file_content(file_content)
     if file_content_validation != "":
         return file_content_validation
-    return write_file_to_database(filename, file_content)
+    return write_file_to_database(
+        filename, file_content, current_user, content_hash, started
+    )
 
 
 @login_required
-def validate_fileString(file_string: str, name: str) -> str:
-    if file_string == "":
+def validate_fileStream(
+    stream: IO[bytes],
+    name: str | None,
+    content_encoding: str | None = None,
+    append: bool = False,
+) -> str:
+    return ingest_fileStream(stream, name, current_user, content_encoding, append)
+
+
+def ingest_fileStream(
+    stream: IO[bytes],
+    name: str | None,
+    user,
+    content_encoding: str | None = None,
+    append: bool = False,
+) -> str:
+    filename, compression = split_compression(
+        secure_filename(name or ""), content_encoding
+    )
+    compression_validation = validate_compression(compression)
+    if compression_validation != "":
+        return compression_validation
+    started = time.perf_counter()
+    content_hash = None
+    try:
+        if not append:
+            content_hash = hash_before_parse(stream, compression)
+            if content_hash is not None:
+                duplicate = find_duplicate(content_hash.hexdigest())
+                if duplicate is not None:
+                    filename_validation = validate_filename(filename)
+                    if filename_validation != "":
+                        return filename_validation
+                    return link_file_to_database(filename, duplicate, user, started)
+        stream = decompress_stream(stream, compression)
+        if not append and content_hash is None:
+            content_hash = hashlib.sha256()
+            stream = HashingReader(stream, content_hash)
+        is_parallel = is_parallel_parse(stream)
+        lines = decode_lines(stream)
+        first_line = next(lines, None)
+    except ValueError as error:
+        return str(error)
+    if first_line is None:
         return "Empty file"
-    filename = secure_filename(name)
     filename_validation = validate_filename(filename)
     if filename_validation != "":
         return filename_validation
-    file_content = parse_fileString(file_string)
+    if is_parallel:
+        file_content = parse_filePath(stream.name, first_line)
+    else:
+        file_content = parse_lines(itertools.chain([first_line], lines))
     file_content_validation = validate_file_content(file_content)
     if file_content_validation != "":
         return file_content_validation
-    return write_file_to_database(filename, file_content)
+    if append:
+        return append_file_to_database(filename, file_content, user)
+    return write_file_to_database(filename, file_content, user, content_hash, started)
 
 
 # Signup validation
@@ -185,9 +671,44 @@ def validate_existing_user(email: str | None, pwd: str | None) -> str:
     return ""
 
 
+def validate_api_user(auth: Authorization | None) -> str:
+    if auth is None:
+        return "Missing credentials."
+    if auth.type == "bearer":
+        user = token_signer.verify(auth.token)
+        if user is None:
+            return "Invalid or expired token."
+        login_user(user)
+        return ""
+    return validate_existing_user(auth.username, auth.password)
+
+
 # processing home page
 
 
+def read_file_view(file, sort_by: str, group_by: str, show_top: int):
+    key = (file.data_id, sort_by, group_by, show_top)
+    contents = view_cache.get(key)
+    if contents is None:
+        with instrumentation.phase("view"):
+            # Homepage views are looked up in their stored top rows
+            contents = read_top_view(file, sort_by, group_by, show_top)
+            if contents is None:
+                contents = compute_file_view(file, sort_by, group_by, show_top)
+        view_cache.put(key, contents)
+    instrumentation.add_rows(len(contents))
+    return contents
+
+
+def compute_file_view(file, sort_by: str, group_by: str, show_top: int):
+    if file.storage == "columnar":
+        table = read_columnar(columnar_path(file.data_id))
+        return table.view(sort_by, group_by, show_top)
+    if current_app.config["VIEW_ENGINE"] == "memory":
+        return load_table(file.data_id).view(sort_by, group_by, show_top)
+    return query_file_view(file.data_id, sort_by, group_by, show_top)
+
+
 class FileData:
     sort_by_options = [
         "---",
@@ -207,22 +728,35 @@ class FileData:
     show_top_option = 10
     is_selected = False
 
-    def __init__(
-        self,
-        file,
-        contents,
-    ):
+    def __init__(self, file):
         self.file = file
-        self.contents = contents
-        self.all_contents = contents
+        self._contents = None
+
+    @property
+    def contents(self):
+        # Rows are only queried when the selected file's table is rendered
+        if self._contents is None:
+            self._contents = read_file_view(
+                self.file,
+                self.sort_by_option,
+                self.group_by_option,
+                self.show_top_option,
+            )
+        return self._contents
 
     def set_is_selected(self, is_selected):
         self.is_selected = is_selected
+        if is_selected:
+            self.read_setting()
+
+    def read_setting(self):
+        from .database import Setting
+
+        setting = Setting.query.filter_by(file_id=self.file.id).first()
+        if setting:
+            self.write_setting_to_content(setting)
 
     def write_setting_to_content(self, setting):
-        self.sort_by_option = setting.sort_by
-        self.group_by_option = setting.group_by
-        self.show_top_option = setting.show_top
         self.apply_setting_to_content(
             setting.sort_by, setting.group_by, setting.show_top
         )
@@ -236,103 +770,59 @@ class FileData:
         self.sort_by_option = sort_by_option
         self.group_by_option = group_by_option
         self.show_top_option = int(show_top_option)
-        if group_by_option != "---":
-            if sort_by_option != "---":
-                self.group_and_sort()
-            else:
-                self.group_and_show_top()
-        else:
-            if sort_by_option != "---":
-                self.sort_and_show_top()
-            else:
-                self.contents = self.all_contents[: self.show_top_option]
-
-    def sort(self):
-        if self.sort_by_option == "chrom1":
-            self.all_contents.sort(
-                key=lambda x: 23
-                if x.chrom1[3:] == "X"
-                else 24
-                if x.chrom1[3:] == "Y"
-                else int(x.chrom1[3:]),
-                reverse=False,
-            )
-        if self.sort_by_option == "chrom2":
-            self.all_contents.sort(
-                key=lambda x: 23
-                if x.chrom2[3:] == "X"
-                else 24
-                if x.chrom2[3:] == "Y"
-                else int(x.chrom2[3:]),
-                reverse=False,
+        self._contents = None
+
+
+class MergedData(FileData):
+    # Several files shown as one table, merged from each file's cached view
+    def __init__(self, files):
+        super().__init__(None)
+        self.files = files
+
+    @property
+    def contents(self):
+        if self._contents is None:
+            views = [
+                (
+                    file.filename,
+                    read_file_view(
+                        file,
+                        self.sort_by_option,
+                        self.group_by_option,
+                        self.show_top_option,
+                    ),
+                )
+                for file in self.files
+            ]
+            self._contents = list(
+                merge_views(
+                    views,
+                    self.sort_by_option,
+                    self.group_by_option,
+                    self.show_top_option,
+                )
             )
-        if self.sort_by_option == "sample":
-            self.all_contents.sort(
-                key=lambda x: int(x.sample[1:]),
-                reverse=False,
-            )
-        if self.sort_by_option == "score":
-            self.all_contents.sort(key=lambda x: x.score, reverse=True)
-        if self.sort_by_option == "start1":
-            self.all_contents.sort(key=lambda x: x.start1, reverse=True)
-        if self.sort_by_option == "end1":
-            self.all_contents.sort(key=lambda x: x.end1, reverse=True)
-        if self.sort_by_option == "start2":
-            self.all_contents.sort(key=lambda x: x.start2, reverse=True)
-        if self.sort_by_option == "end2":
-            self.all_contents.sort(key=lambda x: x.end2, reverse=True)
-        if self.sort_by_option == "score":
-            self.all_contents.sort(key=lambda x: x.score, reverse=True)
-
-    def sort_and_show_top(self):
-        self.sort()
-        self.contents = self.all_contents[: self.show_top_option]
-
-    def group_and_show_top(self):
-        grouped_contents_dic = {}
-        for content in self.all_contents:
-            if self.group_by_option == "chrom1":
-                grouped_content = grouped_contents_dic.get(content.chrom1)
-                if grouped_content is None:
-                    grouped_contents_dic[content.chrom1] = []
-                elif self.show_top_option >= len(grouped_content):
-                    grouped_content.append(content)
-            if self.group_by_option == "chrom2":
-                grouped_content = grouped_contents_dic.get(content.chrom2)
-                if grouped_content is None:
-                    grouped_contents_dic[content.chrom2] = []
-                elif self.show_top_option >= len(grouped_content):
-                    grouped_content.append(content)
-            if self.group_by_option == "sample":
-                grouped_content = grouped_contents_dic.get(content.sample)
-                if grouped_content is None:
-                    grouped_contents_dic[content.sample] = []
-                elif self.show_top_option >= len(grouped_content):
-                    grouped_content.append(content)
-        self.contents = []
-        for grouped_content in grouped_contents_dic.values():
-            self.contents = [*self.contents, *grouped_content]
-
-    def group_and_sort(self) -> None:
-        self.sort()
-        self.group_and_show_top()
+        return self._contents
+
+
+def validate_view_setting(sort_by: str, group_by: str, show_top: int | None) -> str:
+    if sort_by not in FileData.sort_by_options:
+        return f"Invalid sort_by: {sort_by}"
+    if group_by not in FileData.group_by_options:
+        return f"Invalid group_by: {group_by}"
+    if show_top is not None and show_top < 1:
+        return "show_top must be a positive integer"
+    return ""
 
 
 def read_status_from_database() -> list[FileData]:
-    from .database import File, Content, Setting
+    from .database import File
 
     all_files = File.query.filter_by(user_id=current_user.id)
     file_contents = []
     for file in all_files:
-        all_contents = []
-        for validate_content_msg in Content.query.filter_by(file_id=file.id):
-            all_contents.append(validate_content_msg)
-        file_content = FileData(file, all_contents)
+        file_content = FileData(file)
         # TODO Commit system
-        setting = Setting.query.filter_by(file_id=file.id).first()
-        if setting:
-            file_content.write_setting_to_content(setting)
-        # TODO Show multiple files
         if current_user.selected_file == file_content.file.filename:
             file_content.set_is_selected(True)
         file_contents.append(file_content)
@@ -346,7 +836,7 @@ def file_post_response() -> str:
 
 
 def file_delete_response() -> str:
-    from .database import File
+    from .database import File, Content, Setting, Summary, TopRow
 
     filename_to_delete = request.form.get("delete_button")
     if filename_to_delete:
@@ -354,8 +844,22 @@ def file_delete_response() -> str:
             user_id=current_user.id, filename=filename_to_delete
         ).first()
         current_user.selected_file = ""
+        data_id = file_to_delete.data_id
+        # Shared data is only removed along with the last file using it
+        is_shared = File.query.filter(
+            File.data_id == data_id, File.id != file_to_delete.id
+        ).first()
+        if not is_shared:
+            Content.query.filter_by(file_id=data_id).delete()
+            Summary.query.filter_by(file_id=data_id).delete()
+            TopRow.query.filter_by(file_id=data_id).delete()
+        Setting.query.filter_by(file_id=file_to_delete.id).delete()
         db.session.delete(file_to_delete)
         db.session.commit()
+        if not is_shared:
+            if file_to_delete.storage == "columnar":
+                remove_columnar(data_id)
+            view_cache.invalidate_file(data_id)
         return f"{filename_to_delete} deleted successfully"
     return ""
 
@@ -374,6 +878,26 @@ def file_select_response(file_contents: list[FileData]) -> str:
     return ""
 
 
+def file_merge_response(file_contents: list[FileData]) -> MergedData | None:
+    merge_files = request.form.getlist("merge_files")
+    if request.form.get("merge_button") is None or not merge_files:
+        return None
+    sort_by = request.form.get("merge_sortby_dropdown", "---")
+    group_by = request.form.get("merge_groupby_dropdown", "---")
+    show_top = request.form.get("merge_show_top", 10, type=int)
+    if show_top is None or validate_view_setting(sort_by, group_by, show_top) != "":
+        return None
+    merged_data = MergedData(
+        [
+            file_content.file
+            for file_content in file_contents
+            if file_content.file.filename in merge_files
+        ]
+    )
+    merged_data.apply_setting_to_content(sort_by, group_by, show_top)
+    return merged_data
+
+
 def file_operate_response(file_contents: list[FileData]) -> str:
     from .database import Setting
 
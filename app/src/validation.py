@@ -0,0 +1,125 @@
+import re
+import warnings
+import numpy as np
+from .table import COLUMN_DTYPES, COLUMN_NAMES, RANKED_COLUMNS
+
+# (pattern, example) of the names query.chrom_rank and query.sample_rank order:
+# chr7, 7, chrX or chrMT, and S3. Numbers are bounded so their ranks fit a column.
+CHROM_FORMAT = (
+    re.compile(r"(?:chr)?(?:[0-9]{1,9}|X|Y|M|MT)", re.IGNORECASE),
+    "chr7 or chrX",
+)
+SAMPLE_FORMAT = (re.compile(r"S[0-9]{1,9}"), "S3")
+NAME_FORMATS: dict[str, tuple[re.Pattern, str]] = {
+    "chrom1": CHROM_FORMAT,
+    "chrom2": CHROM_FORMAT,
+    "sample": SAMPLE_FORMAT,
+}
+NAME_MAX_LENGTH = 12  # "chr" and nine digits
+COORDINATE_COLUMNS: list[str] = ["start1", "end1", "start2", "end2"]
+MAX_REPORTED_ROWS = 10
+# One character wider than allowed, so longer names are not silently truncated
+FIELD_DTYPES: dict[str, np.dtype] = {
+    name: (
+        np.dtype(f"U{NAME_MAX_LENGTH + 1}")
+        if name in RANKED_COLUMNS
+        else np.dtype(COLUMN_DTYPES[name])
+    )
+    for name in COLUMN_NAMES
+}
+NAME_INDEXES: list[int] = [COLUMN_NAMES.index(name) for name in RANKED_COLUMNS]
+
+
+def convert_rows(
+    lines: list[str], sep: str, row_numbers: list[int], headers: list[str]
+) -> list[tuple]:
+    # A chunk of lines to typed rows through numpy's compiled text parser,
+    # checked whole so that a bad row stops the upload before it is written.
+    # Fields are named by the header, in any order, and rows come out in
+    # COLUMN_NAMES order.
+    try:
+        table = parse_table(lines, sep, row_dtype(headers))
+    except ValueError:
+        table = None
+    if table is not None and has_valid_numbers(table):
+        rows = table[COLUMN_NAMES].tolist()
+        if has_valid_names(rows):
+            return rows
+    raise ValueError(row_error_report(lines, sep, row_numbers, headers))
+
+
+def row_dtype(headers: list[str]) -> np.dtype:
+    return np.dtype([(name, FIELD_DTYPES[name]) for name in headers])
+
+
+def parse_table(lines: list[str], sep: str, dtype: np.dtype) -> np.ndarray:
+    return np.loadtxt(
+        lines, dtype=dtype, delimiter=sep, comments=None, quotechar=None, ndmin=1
+    )
+
+
+def has_valid_numbers(table: np.ndarray) -> bool:
+    valid = np.isfinite(table["score"])
+    for name in COORDINATE_COLUMNS:
+        valid &= table[name] >= 0
+    return bool(valid.all())
+
+
+def has_valid_names(rows: list[tuple]) -> bool:
+    # Names repeat a lot, so each distinct one is matched once per chunk
+    for index, name in zip(NAME_INDEXES, RANKED_COLUMNS):
+        values = {row[index] for row in rows}
+        if not all(is_valid_name(name, value) for value in values):
+            return False
+    return True
+
+
+def is_valid_name(name: str, value: str) -> bool:
+    return NAME_FORMATS[name][0].fullmatch(value) is not None
+
+
+def row_error_report(
+    lines: list[str], sep: str, row_numbers: list[int], headers: list[str]
+) -> str:
+    errors = []
+    for line, row_number in zip(lines, row_numbers):
+        error = row_error(line.split(sep), sep, headers)
+        if error != "":
+            errors.append(f"Row {row_number} {error}")
+    if not errors:
+        return f"Rows {row_numbers[0]} to {row_numbers[-1]} have an invalid value"
+    report = "; ".join(errors[:MAX_REPORTED_ROWS])
+    if len(errors) > MAX_REPORTED_ROWS:
+        report += f"; {len(errors) - MAX_REPORTED_ROWS} more invalid rows"
+    return report
+
+
+def row_error(fields: list[str], sep: str, headers: list[str]) -> str:
+    if len(fields) != len(headers):
+        return f"has {len(fields)} columns, expected {len(headers)}"
+    for name, value in zip(headers, fields):
+        error = field_error(name, value, sep)
+        if error != "":
+            return error
+    return ""
+
+
+def field_error(name: str, value: str, sep: str) -> str:
+    if name in RANKED_COLUMNS:
+        if not is_valid_name(name, value):
+            return f"has a {name} that is not like {NAME_FORMATS[name][1]}: {value!r}"
+        return ""
+    try:
+        # The same parser as the chunk, so both accept exactly the same values.
+        # A blank value parses to no rows, with a warning and an IndexError.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            number = parse_table([value], sep, FIELD_DTYPES[name])[0]
+    except (ValueError, IndexError):
+        number = None
+    if name == "score":
+        if number is None or not np.isfinite(number):
+            return f"has a score that is not a finite number: {value!r}"
+    elif number is None or number < 0:
+        return f"has a {name} that is not a non-negative integer: {value!r}"
+    return ""
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable
+from app.src.metrics import peak_rss, reset_peak_rss
+from .generate import generate_csv
+
+DEFAULT_ROWS = [10_000, 100_000]
+SHOW_TOP = 20
+EMAIL = "bench@bench"
+PASSWORD = "bench"
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results")
+
+
+def measure(stage: str, row_count: int, function: Callable) -> tuple[dict, object]:
+    # Rows per second is over the whole table, so view stages read as scan rates
+    has_peak_rss = reset_peak_rss()
+    started = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - started
+    record = {
+        "stage": stage,
+        "rows": row_count,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(row_count / seconds) if seconds > 0 else None,
+        "peak_rss_bytes": peak_rss() if has_peak_rss else None,
+    }
+    print(
+        f"{row_count:>10} {stage:<32} {record['seconds']:>10.4f}s "
+        f"{record['rows_per_second'] or 0:>12} rows/s "
+        f"{(record['peak_rss_bytes'] or 0) / 1024**2:>8.1f} MiB",
+        file=sys.stderr,
+    )
+    return record, result
+
+
+def create_bench_app(directory: str, storage: str, view_engine: str):
+    # Everything the app writes goes to a throw-away directory
+    os.environ["FLASK_SQLALCHEMY_DATABASE_URI"] = (
+        f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    )
+    os.environ["FLASK_COLUMNAR_STORAGE_PATH"] = os.path.join(directory, "columnar")
+    os.environ["FLASK_UPLOAD_SPOOL_PATH"] = os.path.join(directory, "uploads")
+    os.environ["FLASK_UPLOAD_WORKERS"] = "0"
+    # Views are measured uncached
+    os.environ["FLASK_VIEW_CACHE_MAX_BYTES"] = "0"
+    os.environ["FLASK_STORAGE_BACKEND"] = storage
+    os.environ["FLASK_VIEW_ENGINE"] = view_engine
+    from app import create_app
+
+    return create_app()
+
+
+def bench_row_count(app, row_count: int, seed: int) -> list[dict]:
+    from flask_login import login_user
+    from app.src.database import User
+    from app.src.util import (
+        FileData,
+        compute_file_view,
+        parse_fileString,
+        read_status_from_database,
+        write_file_to_database,
+    )
+
+    records = []
+    file_string = generate_csv(row_count, seed)
+    filename = f"bench_{row_count}.csv"
+    with app.test_request_context():
+        user = User.query.filter_by(email=EMAIL).first()
+        login_user(user)
+
+        def parse():
+            _, chunks = parse_fileString(file_string)
+            return sum(len(chunk) for chunk in chunks)
+
+        record, _ = measure("parse_fileString", row_count, parse)
+        records.append(record)
+        record, status = measure(
+            "write_file_to_database",
+            row_count,
+            lambda: write_file_to_database(
+                filename, parse_fileString(file_string), user
+            ),
+        )
+        if status != "ok":
+            raise RuntimeError(f"Ingest of {filename} failed: {status}")
+        records.append(record)
+        record, file_contents = measure(
+            "read_status_from_database", row_count, read_status_from_database
+        )
+        records.append(record)
+
+        file_data = next(
+            content for content in file_contents if content.file.filename == filename
+        )
+        for sort_by in FileData.sort_by_options:
+            for group_by in FileData.group_by_options:
+
+                def compute():
+                    file = file_data.file
+                    return compute_file_view(file, sort_by, group_by, SHOW_TOP)
+
+                def view():
+                    file_data.apply_setting_to_content(sort_by, group_by, SHOW_TOP)
+                    return file_data.contents
+
+                # The compute path scans the file; the first view also stores
+                # its top rows, which later views only look up
+                for stage, function in (
+                    ("compute", compute),
+                    ("view", view),
+                    ("view stored", view),
+                ):
+                    record, _ = measure(
+                        f"{stage} {sort_by}/{group_by}", row_count, function
+                    )
+                    records.append(record)
+
+    client = app.test_client()
+    client.post("/login", data={"email": EMAIL, "password": PASSWORD})
+    # The first render also compiles the template
+    client.get("/")
+    record, response = measure(
+        "homepage_render", row_count, lambda: client.get("/")
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Homepage returned {response.status_code}")
+    records.append(record)
+    return records
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    previous = {(record["rows"], record["stage"]): record for record in baseline}
+    print(f"\nCompared with {baseline_path} (seconds, new / old)", file=sys.stderr)
+    for record in results:
+        old = previous.get((record["rows"], record["stage"]))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = record["seconds"] / old["seconds"]
+        print(
+            f"{record['rows']:>10} {record['stage']:<32} {old['seconds']:>10.4f}s "
+            f"-> {record['seconds']:>10.4f}s {ratio:>7.2f}x",
+            file=sys.stderr,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time ingest, views and rendering")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--storage", choices=["sql", "columnar"], default="sql")
+    parser.add_argument("--view-engine", choices=["sql", "memory"], default="sql")
+    parser.add_argument("--output", help="JSON results path")
+    parser.add_argument("--compare", help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_bench_app(directory, args.storage, args.view_engine)
+        app.test_client().post(
+            "/api/signup", json={"email": EMAIL, "name": "bench", "password": PASSWORD}
+        )
+        for row_count in args.rows:
+            results.extend(bench_row_count(app, row_count, args.seed))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "view_engine": args.view_engine,
+        # Linux reports kilobytes
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_PATH, f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import sys
+from typing import IO, Iterator
+import numpy as np
+
+HEADER = "chrom1,start1,end1,chrom2,start2,end2,sample,score"
+# GRCh38 chromosome lengths, chromosomes are drawn proportionally to them
+CHROMOSOME_LENGTHS: dict[str, int] = {
+    "chr1": 248_956_422,
+    "chr2": 242_193_529,
+    "chr3": 198_295_559,
+    "chr4": 190_214_555,
+    "chr5": 181_538_259,
+    "chr6": 170_805_979,
+    "chr7": 159_345_973,
+    "chr8": 145_138_636,
+    "chr9": 138_394_717,
+    "chr10": 133_797_422,
+    "chr11": 135_086_622,
+    "chr12": 133_275_309,
+    "chr13": 114_364_328,
+    "chr14": 107_043_718,
+    "chr15": 101_991_189,
+    "chr16": 90_338_345,
+    "chr17": 83_257_441,
+    "chr18": 80_373_285,
+    "chr19": 58_617_616,
+    "chr20": 64_444_167,
+    "chr21": 46_709_983,
+    "chr22": 50_818_468,
+    "chrX": 156_040_895,
+    "chrY": 57_227_415,
+}
+CIS_FRACTION = 0.7
+# Cis partners lie 1 kb to 10 Mb away, log-uniformly like contact decay
+MIN_DISTANCE = 1_000
+MAX_DISTANCE = 10_000_000
+CHUNK_ROWS = 500_000
+
+
+def generate_columns(
+    row_count: int, rng: np.random.Generator, samples: int = 4, width: int = 1
+) -> dict[str, np.ndarray]:
+    names = np.array(list(CHROMOSOME_LENGTHS))
+    lengths = np.array(list(CHROMOSOME_LENGTHS.values()))
+    weights = lengths / lengths.sum()
+    chrom1 = rng.choice(len(names), row_count, p=weights)
+    start1 = (rng.random(row_count) * (lengths[chrom1] - width)).astype(np.int64)
+
+    is_cis = rng.random(row_count) < CIS_FRACTION
+    chrom2 = np.where(is_cis, chrom1, rng.choice(len(names), row_count, p=weights))
+    distance = np.exp(
+        rng.uniform(np.log(MIN_DISTANCE), np.log(MAX_DISTANCE), row_count)
+    ).astype(np.int64)
+    cis_start = np.clip(start1 + distance, 0, lengths[chrom2] - width)
+    trans_start = (rng.random(row_count) * (lengths[chrom2] - width)).astype(np.int64)
+    start2 = np.where(is_cis, cis_start, trans_start)
+
+    # A few samples dominate, as with unevenly sequenced libraries
+    sample_weights = 1 / np.arange(1, samples + 1)
+    sample = rng.choice(samples, row_count, p=sample_weights / sample_weights.sum())
+    return {
+        "chrom1": names[chrom1],
+        "start1": start1,
+        "end1": start1 + width,
+        "chrom2": names[chrom2],
+        "start2": start2,
+        "end2": start2 + width,
+        "sample": np.char.add("S", (sample + 1).astype(str)),
+        "score": rng.uniform(1, 10, row_count),
+    }
+
+
+def generate_lines(
+    row_count: int, seed: int = 0, samples: int = 4, width: int = 1
+) -> Iterator[str]:
+    # CSV text in blocks of CHUNK_ROWS lines, header first
+    rng = np.random.default_rng(seed)
+    yield HEADER + "\n"
+    for chunk_start in range(0, row_count, CHUNK_ROWS):
+        chunk_rows = min(CHUNK_ROWS, row_count - chunk_start)
+        columns = generate_columns(chunk_rows, rng, samples, width)
+        values = [column.tolist() for column in columns.values()]
+        yield "".join(
+            f"{c1},{s1},{e1},{c2},{s2},{e2},{sample},{score}\n"
+            for c1, s1, e1, c2, s2, e2, sample, score in zip(*values)
+        )
+
+
+def generate_csv(
+    row_count: int, seed: int = 0, samples: int = 4, width: int = 1
+) -> str:
+    return "".join(generate_lines(row_count, seed, samples, width))
+
+
+def write_csv(
+    output: IO[str], row_count: int, seed: int = 0, samples: int = 4, width: int = 1
+) -> None:
+    for block in generate_lines(row_count, seed, samples, width):
+        output.write(block)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic contact table")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output", nargs="?", help="CSV path, stdout by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", type=int, default=4)
+    parser.add_argument("--width", type=int, default=1, help="interval length")
+    args = parser.parse_args()
+    if args.output is None:
+        write_csv(sys.stdout, args.rows, args.seed, args.samples, args.width)
+        return
+    with open(args.output, "w") as output:
+        write_csv(output, args.rows, args.seed, args.samples, args.width)
+
+
+if __name__ == "__main__":
+    main()
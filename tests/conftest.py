@@ -0,0 +1,51 @@
+import base64
+import pytest
+from app import create_app
+
+CREDENTIALS = {"email": "tester@example.com", "name": "tester", "password": "secret1"}
+HEADER = "chrom1,start1,end1,chrom2,start2,end2,sample,score\n"
+
+
+@pytest.fixture(params=["sql", "columnar"])
+def app(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("FLASK_SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setenv("FLASK_STORAGE_BACKEND", request.param)
+    monkeypatch.setenv("FLASK_COLUMNAR_STORAGE_PATH", str(tmp_path / "columnar"))
+    monkeypatch.setenv("FLASK_UPLOAD_SPOOL_PATH", str(tmp_path / "uploads"))
+    monkeypatch.setenv("FLASK_UPLOAD_WORKERS", "0")
+    monkeypatch.setenv("FLASK_USER_CACHE_TTL", "0")
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post("/api/signup", json=CREDENTIALS)
+    assert response.status_code == 201, response.json
+    return client
+
+
+@pytest.fixture
+def auth() -> dict[str, str]:
+    user = f"{CREDENTIALS['email']}:{CREDENTIALS['password']}"
+    return {"Authorization": "Basic " + base64.b64encode(user.encode()).decode()}
+
+
+@pytest.fixture
+def upload(client, auth):
+    def upload(filename: str, content: str, **headers):
+        return client.post(
+            "/api/upload",
+            data=content.encode("utf-8"),
+            headers={**auth, "filename": filename, **headers},
+        )
+
+    return upload
+
+
+def make_rows(count: int) -> str:
+    return "".join(
+        f"chr{index % 3 + 1},{index * 10},{index * 10 + 1},"
+        f"chr{index % 2 + 1},{index * 20},{index * 20 + 1},S{index % 4},{index / 7}\n"
+        for index in range(count)
+    )
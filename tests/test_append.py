@@ -0,0 +1,49 @@
+import pytest
+from conftest import HEADER, make_rows
+
+ORIGINAL = make_rows(30)
+APPENDED = "chr9,5,6,chr9,7,8,S9,99.5\n" * 3
+
+
+def file_rows(client, auth, filename: str) -> list[str]:
+    response = client.get(f"/api/files/{filename}/rows?format=csv", headers=auth)
+    assert response.status_code == 200, response.json
+    return response.data.decode().splitlines()[1:]
+
+
+def file_summary(client, auth, filename: str) -> list[dict]:
+    url = f"/api/files/{filename}/summary?group_by=sample"
+    response = client.get(url, headers=auth)
+    assert response.status_code == 200, response.json
+    return response.json["groups"]
+
+
+@pytest.mark.parametrize("appended_to", ["first.csv", "second.csv"])
+def test_append_to_shared_data_leaves_the_sharer_untouched(
+    client, auth, upload, appended_to
+):
+    # second.csv is a duplicate sharing the rows of first.csv, either may grow
+    assert upload("first.csv", HEADER + ORIGINAL).status_code == 201
+    assert upload("second.csv", HEADER + ORIGINAL).status_code == 201
+    rows = file_rows(client, auth, "first.csv")
+    summary = file_summary(client, auth, "first.csv")
+    response = upload(appended_to, HEADER + APPENDED, append="true")
+    assert response.status_code == 201, response.json
+    assert response.json["rows"] == 3
+    sharer = "second.csv" if appended_to == "first.csv" else "first.csv"
+    assert file_rows(client, auth, sharer) == rows
+    assert file_summary(client, auth, sharer) == summary
+    appended_rows = file_rows(client, auth, appended_to)
+    assert appended_rows[:30] == rows
+    assert appended_rows[30:] == ["chr9,5,6,chr9,7,8,S9,99.5"] * 3
+    assert file_summary(client, auth, appended_to)[-1]["group"] == "S9"
+
+
+def test_appended_rows_lead_the_stored_view(client, auth, upload):
+    assert upload("grow.csv", HEADER + ORIGINAL).status_code == 201
+    url = "/api/files/grow.csv/rows?format=csv&sort_by=score&show_top=2"
+    before = client.get(url, headers=auth).data.decode().splitlines()[1:]
+    assert upload("grow.csv", HEADER + APPENDED, append="true").status_code == 201
+    after = client.get(url, headers=auth).data.decode().splitlines()[1:]
+    assert after == ["chr9,5,6,chr9,7,8,S9,99.5"] * 2
+    assert before[0] != after[0]
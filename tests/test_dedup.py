@@ -0,0 +1,42 @@
+import gzip
+from app.src import util
+from app.src.database import File
+from conftest import HEADER, make_rows
+
+
+def data_ids(app) -> dict[str, int]:
+    with app.app_context():
+        return {file.filename: file.data_id for file in File.query}
+
+
+def test_duplicate_upload_is_linked_without_parsing(
+    app, client, auth, upload, monkeypatch
+):
+    content = HEADER + make_rows(30)
+    assert upload("first.csv", content).status_code == 201
+
+    def parse_lines(*args, **kwargs):
+        raise AssertionError("a duplicate upload was parsed")
+
+    monkeypatch.setattr(util, "parse_lines", parse_lines)
+    response = upload("second.csv", content)
+    assert response.status_code == 201, response.json
+    assert response.json["rows"] == 30
+    # The hash is of the decompressed bytes, so a compressed copy matches too
+    response = client.post(
+        "/api/upload",
+        data=gzip.compress(content.encode()),
+        headers={**auth, "filename": "third.csv.gz"},
+    )
+    assert response.status_code == 201, response.json
+    ids = data_ids(app)
+    assert ids["first.csv"] == ids["second.csv"] == ids["third.csv"]
+    first = client.get("/api/files/first.csv/rows", headers=auth).data
+    assert client.get("/api/files/third.csv/rows", headers=auth).data == first
+
+
+def test_different_content_is_not_linked(app, upload):
+    assert upload("first.csv", HEADER + make_rows(30)).status_code == 201
+    assert upload("second.csv", HEADER + make_rows(31)).status_code == 201
+    ids = data_ids(app)
+    assert ids["first.csv"] != ids["second.csv"]
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+from app.src.columnar import read_columnar
+from conftest import HEADER, make_rows
+
+VIEWS = ["sort_by=score&group_by=sample&show_top=3", "sort_by=start2", ""]
+TYPES = {name: int for name in ("start1", "end1", "start2", "end2")} | {"score": float}
+
+
+def view_rows(client, auth, query: str) -> list[dict]:
+    response = client.get(f"/api/files/rows.csv/rows?{query}", headers=auth)
+    assert response.status_code == 200, response.json
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+def export(client, auth, export_format: str, query: str) -> bytes:
+    response = client.get(
+        f"/api/files/rows.csv/export?format={export_format}&{query}", headers=auth
+    )
+    assert response.status_code == 200, response.json
+    assert "attachment" in response.headers["Content-Disposition"]
+    return response.data
+
+
+def test_text_exports_parse_back_to_the_view(client, auth, upload):
+    assert upload("rows.csv", HEADER + make_rows(60)).status_code == 201
+    for query in VIEWS:
+        expected = view_rows(client, auth, query)
+        for export_format, delimiter in (("csv", ","), ("tsv", "\t")):
+            text = export(client, auth, export_format, query).decode()
+            reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+            assert reader.fieldnames == HEADER.strip().split(",")
+            rows = [
+                {name: TYPES.get(name, str)(value) for name, value in row.items()}
+                for row in reader
+            ]
+            assert rows == expected, (export_format, query)
+
+
+def test_columnar_export_reads_back_to_the_view(client, auth, upload, tmp_path):
+    assert upload("rows.csv", HEADER + make_rows(60)).status_code == 201
+    for index, query in enumerate(VIEWS):
+        path = tmp_path / f"export{index}.col"
+        path.write_bytes(export(client, auth, "columnar", query))
+        table = read_columnar(str(path))
+        rows = [row._asdict() for row in table.rows(slice(None))]
+        assert rows == view_rows(client, auth, query), query
@@ -0,0 +1,56 @@
+import os
+from app import create_app, db
+from app.src.database import UploadJob, UploadSession, User
+from app.src.jobs import upload_queue
+from conftest import CREDENTIALS, HEADER, make_rows
+
+
+def spool_file(name: str, content: str) -> str:
+    os.makedirs(upload_queue.spool_path, exist_ok=True)
+    path = os.path.join(upload_queue.spool_path, name)
+    with open(path, "w") as spool:
+        spool.write(content)
+    return path
+
+
+def interrupted_job(app, status: str) -> tuple[str, str]:
+    # A job as a stopped process left it, with its body spooled
+    with app.app_context():
+        user = User.query.filter_by(email=CREDENTIALS["email"]).one()
+        job = upload_queue.new_job("interrupted.csv", user, None, False)
+        job.status = status
+        db.session.add(job)
+        db.session.commit()
+        return job.id, spool_file(job.id, HEADER + make_rows(5))
+
+
+def test_recovery_fails_jobs_without_workers_and_removes_orphans(app, client):
+    job_id, job_path = interrupted_job(app, "running")
+    orphan = spool_file("tmpabc123", "left behind")
+    with app.app_context():
+        upload = UploadSession(id="a" * 32, filename="parts.csv", user_id=1)
+        upload.next_part = 2
+        db.session.add(upload)
+        db.session.commit()
+        part = spool_file(f"{upload.id}.1", HEADER)
+        upload_queue.recover()
+        job = db.session.get(UploadJob, job_id)
+        assert (job.status, job.error) == ("failed", "Interrupted by a restart")
+    assert not os.path.exists(job_path)
+    assert not os.path.exists(orphan)
+    assert os.path.exists(part)
+
+
+def test_recovery_runs_spooled_jobs_again(app, client, auth, monkeypatch):
+    job_id, _ = interrupted_job(app, "queued")
+    monkeypatch.setenv("FLASK_UPLOAD_WORKERS", "1")
+    restarted = create_app()
+    upload_queue.executor.shutdown(wait=True)
+    with restarted.app_context():
+        job = db.session.get(UploadJob, job_id)
+        assert (job.status, job.row_count) == ("done", 5)
+    response = restarted.test_client().get(
+        "/api/files/interrupted.csv/rows", headers=auth
+    )
+    assert response.status_code == 200, response.json
+    assert len(response.data.decode().splitlines()) == 5
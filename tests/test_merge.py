@@ -0,0 +1,42 @@
+import json
+from conftest import HEADER, make_rows
+
+VIEWS = [
+    ("score", "sample", 3),
+    ("chrom1", "---", None),
+    ("start2", "chrom2", 5),
+    ("---", "---", 7),
+    ("end1", "chrom1", None),
+]
+
+
+def read_rows(client, auth, url: str) -> list[dict]:
+    response = client.get(url, headers=auth)
+    assert response.status_code == 200, response.json
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+def test_merged_view_matches_the_view_of_one_upload(client, auth, upload):
+    # The second file repeats rows of the first, so the merge must break ties
+    # by file, as if both had been uploaded as one file
+    first, second = make_rows(40), make_rows(25)
+    assert upload("first.csv", HEADER + first).status_code == 201
+    assert upload("second.csv", HEADER + second).status_code == 201
+    assert upload("both.csv", HEADER + first + second).status_code == 201
+    for sort_by, group_by, show_top in VIEWS:
+        query = f"sort_by={sort_by}&group_by={group_by}"
+        if show_top is not None:
+            query += f"&show_top={show_top}"
+        merged = read_rows(
+            client, auth, f"/api/merge?files=first.csv,second.csv&{query}"
+        )
+        expected = read_rows(client, auth, f"/api/files/both.csv/rows?{query}")
+        filenames = [row.pop("filename") for row in merged]
+        assert merged == expected, query
+        if show_top is not None:
+            continue
+        # Without a limit, the rows of each file are all there, in its own order
+        for filename in ("first.csv", "second.csv"):
+            own = read_rows(client, auth, f"/api/files/{filename}/rows?{query}")
+            tagged = [row for row, name in zip(merged, filenames) if name == filename]
+            assert tagged == own, (filename, query)
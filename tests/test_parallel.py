@@ -0,0 +1,38 @@
+import pytest
+from app import create_app
+from app.src.parsepool import parse_pool
+from conftest import HEADER, make_rows
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("FLASK_SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setenv("FLASK_UPLOAD_SPOOL_PATH", str(tmp_path / "uploads"))
+    monkeypatch.setenv("FLASK_UPLOAD_WORKERS", "0")
+    monkeypatch.setenv("FLASK_USER_CACHE_TTL", "0")
+    monkeypatch.setenv("FLASK_PARSE_WORKERS", "2")
+    monkeypatch.setenv("FLASK_PARALLEL_PARSE_MIN_BYTES", "1")
+    monkeypatch.setenv("FLASK_PARSE_CHUNK_BYTES", "1000")
+    yield create_app()
+    parse_pool.shutdown()
+
+
+def test_uploads_share_the_parse_pool(client, auth, upload):
+    executors = []
+    for filename in ("first.csv", "second.csv"):
+        response = upload(filename, HEADER + make_rows(300))
+        assert response.status_code == 201, response.json
+        assert response.json["rows"] == 300
+        executors.append(parse_pool.executor)
+    assert executors[0] is not None and executors[0] is executors[1]
+    rows = client.get("/api/files/second.csv/rows", headers=auth).data
+    assert len(rows.decode().splitlines()) == 300
+
+
+def test_invalid_range_leaves_the_pool_usable(client, upload):
+    bad = HEADER + make_rows(200) + "chr1,oops,1,chr2,1,2,S1,0.5\n" + make_rows(50)
+    response = upload("bad.csv", bad)
+    assert response.status_code == 400
+    assert "Row 202" in response.json["error"]
+    response = upload("good.csv", HEADER + make_rows(300))
+    assert response.status_code == 201, response.json
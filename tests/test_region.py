@@ -0,0 +1,59 @@
+import json
+import random
+from conftest import HEADER
+
+REGIONS = [
+    ("chr1:1,000,000-1,200,000", None),
+    ("chr2:100,000-100,050", None),
+    (None, "chr1:3,000,000-3,000,001"),
+    ("chr2", "chr1:500,000-4,000,000"),
+]
+
+
+def interval_rows(count: int) -> list[tuple]:
+    # Short and long intervals, so rows sit in bins of every level
+    generator = random.Random(12)
+    rows = []
+    for index in range(count):
+        sides = []
+        for _ in range(2):
+            start = generator.randrange(0, 5_000_000)
+            span = generator.choice([1, 100, 20_000, 300_000, 3_000_000])
+            sides += [f"chr{generator.randint(1, 2)}", start, start + span]
+        rows.append((*sides, f"S{index % 3}", float(index)))
+    return rows
+
+
+def overlaps(row: tuple, side: int, region: str | None) -> bool:
+    if region is None:
+        return True
+    chrom, _, interval = region.partition(":")
+    start, end = (0, 2**62)
+    if interval:
+        start, end = (int(value.replace(",", "")) for value in interval.split("-"))
+    offset = 3 * (side - 1)
+    return row[offset] == chrom and row[offset + 1] < end and row[offset + 2] > start
+
+
+def test_region_rows_match_a_brute_force_filter(client, auth, upload):
+    rows = interval_rows(600)
+    content = HEADER + "".join(",".join(map(str, row)) + "\n" for row in rows)
+    assert upload("regions.csv", content).status_code == 201
+    for region1, region2 in REGIONS:
+        query = "".join(
+            f"&region{side}={region}"
+            for side, region in (("1", region1), ("2", region2))
+            if region is not None
+        )
+        response = client.get(
+            f"/api/files/regions.csv/rows?sort_by=score{query}", headers=auth
+        )
+        assert response.status_code == 200, response.json
+        scores = [json.loads(line)["score"] for line in response.data.splitlines()]
+        expected = [
+            row[7]
+            for row in rows
+            if overlaps(row, 1, region1) and overlaps(row, 2, region2)
+        ]
+        assert scores == sorted(expected, reverse=True), (region1, region2)
+        assert scores, (region1, region2)
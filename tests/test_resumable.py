@@ -0,0 +1,52 @@
+import gzip
+import json
+from conftest import HEADER, make_rows
+from app.src.resumable import MAX_LINE_BYTES
+
+
+def start_upload(client, auth, filename: str) -> str:
+    response = client.post("/api/uploads", headers={**auth, "filename": filename})
+    assert response.status_code == 201
+    return response.json["upload_id"]
+
+
+def put_part(client, auth, upload_id: str, part_number: int, data: bytes):
+    url = f"/api/uploads/{upload_id}/parts/{part_number}"
+    return client.put(url, data=data, headers=auth)
+
+
+def test_parts_split_inside_lines_are_ingested_once(client, auth):
+    body = (HEADER + make_rows(100)).encode()
+    upload_id = start_upload(client, auth, "parts.csv.gz")
+    cuts = [0, 5, 700, 701, 2500, len(body)]
+    for part_number, (start, end) in enumerate(zip(cuts, cuts[1:]), start=1):
+        part = gzip.compress(body[start:end])
+        assert put_part(client, auth, upload_id, part_number, part).status_code == 200
+    response = client.post(f"/api/uploads/{upload_id}/complete", headers=auth)
+    assert response.status_code == 201, response.json
+    assert response.json["rows"] == 100
+    rows = client.get("/api/files/parts.csv/rows", headers=auth).data.splitlines()
+    assert [json.loads(row)["start1"] for row in rows] == list(range(0, 1000, 10))
+
+
+def test_invalid_row_is_numbered_from_the_top_of_the_file(client, auth):
+    upload_id = start_upload(client, auth, "numbered.csv")
+    part = (HEADER + make_rows(10)).encode()
+    assert put_part(client, auth, upload_id, 1, part).status_code == 200
+    part = (make_rows(3) + "chr1,1,2\n").encode()
+    response = put_part(client, auth, upload_id, 2, part)
+    assert response.status_code == 400
+    assert response.json["error"] == "Part 2: Row 15 has 3 columns, expected 8"
+    assert response.json["next_part"] == 2
+
+
+def test_part_without_newline_is_rejected_once_the_line_is_too_long(client, auth):
+    upload_id = start_upload(client, auth, "long.csv")
+    assert put_part(client, auth, upload_id, 1, HEADER.encode()).status_code == 200
+    part = b"x" * (MAX_LINE_BYTES // 2)
+    assert put_part(client, auth, upload_id, 2, part).status_code == 200
+    response = put_part(client, auth, upload_id, 3, part + b"x")
+    assert response.status_code == 400
+    assert response.json["error"] == (
+        f"Part 3: Line 2 is longer than {MAX_LINE_BYTES} bytes"
+    )
@@ -0,0 +1,67 @@
+import base64
+import json
+from conftest import HEADER, make_rows
+
+
+def encoded(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_rows_pages_with_cursor(client, auth, upload):
+    assert upload("rows.csv", HEADER + make_rows(25)).status_code == 201
+    url = "/api/files/rows.csv/rows?sort_by=score&group_by=chrom1&limit=10"
+    rows, cursor = [], None
+    while True:
+        query = f"&cursor={cursor}" if cursor else ""
+        response = client.get(url + query, headers=auth)
+        assert response.status_code == 200
+        rows += response.data.decode().splitlines()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert len(rows) == 25
+
+
+def read_pages(client, auth, url: str) -> list[dict]:
+    rows, cursor = [], None
+    while True:
+        query = f"&cursor={cursor}" if cursor else ""
+        response = client.get(url + query, headers=auth)
+        assert response.status_code == 200, response.json
+        rows += [json.loads(line) for line in response.data.decode().splitlines()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows
+
+
+def test_stored_view_pages_match_computed_rows(client, auth, upload):
+    # A region filter is not applied to stored views, so its pages are computed
+    assert upload("rows.csv", HEADER + make_rows(40)).status_code == 201
+    url = "/api/files/rows.csv/rows?sort_by=score&group_by=chrom1&show_top=3&limit=2"
+    stored = read_pages(client, auth, url)
+    computed = read_pages(client, auth, url + "&region1=chr1")
+    assert len(stored) == 9
+    assert [row for row in stored if row["chrom1"] == "chr1"] == computed
+
+
+def test_rows_rejects_cursor_of_wrong_types(app, client, auth, upload):
+    assert upload("rows.csv", HEADER + make_rows(5)).status_code == 201
+    url = "/api/files/rows.csv/rows?sort_by=score&group_by=chrom1&limit=2"
+    if app.config["STORAGE_BACKEND"] == "columnar":
+        cursors = [[-3], [1.5], [True], ["1"], [1, 2]]
+    else:
+        # group rank, group value, score, upload order
+        cursors = [[{"a": 1}, 2], [{"a": 1}, "chr1", 1.0, 2], [1, 2, 1.0, 2]]
+        cursors += [[1, "chr1", "high", 2], [1, "chr1", 1.0, 2**70], [1, "chr1"]]
+    for cursor in cursors:
+        response = client.get(url + f"&cursor={encoded(cursor)}", headers=auth)
+        assert response.status_code == 400, cursor
+        assert response.json == {"error": "Invalid cursor"}
+
+
+def test_rows_accepts_integer_score_in_cursor(app, client, auth, upload):
+    assert upload("rows.csv", HEADER + make_rows(5)).status_code == 201
+    cursor = [0] if app.config["STORAGE_BACKEND"] == "columnar" else [1, "chr1", 1, 2]
+    url = "/api/files/rows.csv/rows?sort_by=score&group_by=chrom1&limit=2"
+    response = client.get(url + f"&cursor={encoded(cursor)}", headers=auth)
+    assert response.status_code == 200
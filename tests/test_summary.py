@@ -0,0 +1,93 @@
+import random
+import pytest
+from conftest import HEADER
+
+COLUMNS = HEADER.strip().split(",")
+
+
+def random_rows(count: int, seed: int) -> list[dict]:
+    generator = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        start1, start2 = generator.randrange(10**6), generator.randrange(10**6)
+        rows.append(
+            {
+                "chrom1": f"chr{generator.randint(1, 3)}",
+                "start1": start1,
+                "end1": start1 + generator.randrange(1, 5000),
+                "chrom2": f"chr{generator.choice(['2', '10', 'X'])}",
+                "start2": start2,
+                "end2": start2 + generator.randrange(1, 5000),
+                "sample": f"S{generator.randint(1, 12)}",
+                "score": round(generator.uniform(-10, 10), 3),
+            }
+        )
+    return rows
+
+
+def csv_text(rows: list[dict]) -> str:
+    return "".join(",".join(str(row[name]) for name in COLUMNS) + "\n" for row in rows)
+
+
+def expected_summary(rows: list[dict], group_by: str) -> dict:
+    groups = {}
+    for row in rows:
+        groups.setdefault(None if group_by == "---" else row[group_by], []).append(row)
+    summary = {}
+    for group, members in groups.items():
+        scores = [row["score"] for row in members]
+        span1 = [row["end1"] - row["start1"] for row in members]
+        span2 = [row["end2"] - row["start2"] for row in members]
+        summary[group] = {
+            "group": group,
+            "count": len(members),
+            "score_mean": pytest.approx(sum(scores) / len(members)),
+            "score_min": min(scores),
+            "score_max": max(scores),
+            "span1_mean": pytest.approx(sum(span1) / len(members)),
+            "span1_max": max(span1),
+            "span2_mean": pytest.approx(sum(span2) / len(members)),
+            "span2_max": max(span2),
+        }
+    return summary
+
+
+def test_summaries_match_recomputed_aggregates(client, auth, upload):
+    rows = random_rows(300, seed=3)
+    assert upload("stats.csv", HEADER + csv_text(rows)).status_code == 201
+    # The appended rows are merged into the stored summaries
+    appended = random_rows(120, seed=4)
+    response = upload("stats.csv", HEADER + csv_text(appended), append="true")
+    assert response.status_code == 201, response.json
+    rows += appended
+    for group_by in ("---", "chrom1", "chrom2", "sample"):
+        response = client.get(
+            f"/api/files/stats.csv/summary?group_by={group_by}", headers=auth
+        )
+        assert response.status_code == 200, response.json
+        expected = expected_summary(rows, group_by)
+        groups = response.json["groups"]
+        assert {group["group"]: group for group in groups} == expected, group_by
+    # Groups come in natural order: chr2 before chr10, S2 before S10
+    assert [group["group"] for group in groups][:3] == ["S1", "S2", "S3"]
+
+
+def test_region_summary_matches_recomputed_aggregates(client, auth, upload):
+    rows = random_rows(300, seed=5)
+    assert upload("stats.csv", HEADER + csv_text(rows)).status_code == 201
+    region = "chr2:200,000-600,000"
+    response = client.get(
+        f"/api/files/stats.csv/summary?group_by=chrom2&region1={region}",
+        headers=auth,
+    )
+    assert response.status_code == 200, response.json
+    selected = [
+        row
+        for row in rows
+        if row["chrom1"] == "chr2" and row["start1"] < 600_000 and row["end1"] > 200_000
+    ]
+    groups = response.json["groups"]
+    assert [group["group"] for group in groups] == ["chr2", "chr10", "chrX"]
+    assert {group["group"]: group for group in groups} == expected_summary(
+        selected, "chrom2"
+    )
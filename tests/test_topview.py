@@ -0,0 +1,39 @@
+from app.src.database import File, TopRow
+from app.src.topview import TOP_VIEW_GROUPS, TOP_VIEW_SORTS, read_top_view
+from app.src.util import compute_file_view
+from conftest import HEADER, make_rows
+
+# Repeats rows of the file, so ties must still break by upload order
+APPENDED = make_rows(12) + "chr9,5,6,chr9,7,8,S9,99.5\n" * 3
+
+
+def assert_stored_views_match(app) -> None:
+    with app.app_context():
+        file = File.query.filter_by(filename="rows.csv").one()
+        for sort_by in TOP_VIEW_SORTS:
+            for group_by in TOP_VIEW_GROUPS:
+                for show_top in (1, 5, 20):
+                    stored = read_top_view(file, sort_by, group_by, show_top)
+                    computed = compute_file_view(file, sort_by, group_by, show_top)
+                    assert [tuple(row) for row in stored] == [
+                        tuple(row) for row in computed
+                    ], (sort_by, group_by, show_top)
+
+
+def test_views_are_stored_on_first_request(app, client, auth, upload):
+    assert upload("rows.csv", HEADER + make_rows(60)).status_code == 201
+    with app.app_context():
+        assert TopRow.query.count() == 0
+    url = "/api/files/rows.csv/rows?sort_by=score&group_by=sample&show_top=5"
+    assert client.get(url, headers=auth).status_code == 200
+    with app.app_context():
+        views = {(row.sort_by, row.group_by) for row in TopRow.query}
+        assert views == {("score", "sample")}
+
+
+def test_stored_views_match_computed_views(app, upload):
+    assert upload("rows.csv", HEADER + make_rows(90)).status_code == 201
+    assert_stored_views_match(app)
+    response = upload("rows.csv", HEADER + APPENDED, append="true")
+    assert response.status_code == 201, response.json
+    assert_stored_views_match(app)
@@ -0,0 +1,76 @@
+import json
+import warnings
+import pytest
+from conftest import HEADER, make_rows
+from app.src.validation import field_error
+
+
+def test_permuted_header_maps_fields_by_name(client, auth, upload):
+    names = HEADER.strip().split(",")
+    order = [2, 1, 0, 7, 6, 5, 4, 3]
+    lines = [",".join(names[index] for index in order)]
+    for row in make_rows(3).splitlines():
+        fields = row.split(",")
+        lines.append(",".join(fields[index] for index in order))
+    response = upload("permuted.csv", "\n".join(lines) + "\n")
+    assert response.status_code == 201, response.json
+    rows = client.get("/api/files/permuted.csv/rows", headers=auth).data.splitlines()
+    expected = [dict(zip(names, row.split(","))) for row in make_rows(3).splitlines()]
+    for row, fields in zip(map(json.loads, rows), expected):
+        assert row["start1"] == int(fields["start1"])
+        assert row["end1"] == int(fields["end1"])
+        assert row["chrom2"] == fields["chrom2"]
+        assert row["score"] == float(fields["score"])
+
+
+def test_renamed_header_column_is_rejected(upload):
+    header = HEADER.replace("start2", "foo")
+    response = upload("renamed.csv", header + make_rows(3))
+    assert response.status_code == 400
+    assert response.json == {"error": "Missing mandatory column: start2"}
+
+
+def test_invalid_row_is_reported_under_its_header_name(upload):
+    header = "chrom1,end1,start1,chrom2,start2,end2,sample,score\n"
+    response = upload("invalid.csv", header + "chr1,10,x,chr2,1,2,S1,0.5\n")
+    assert response.status_code == 400
+    assert response.json == {
+        "error": "Row 2 has a start1 that is not a non-negative integer: 'x'"
+    }
+
+
+@pytest.mark.parametrize("value", ["", "abc", "-1"])
+def test_field_error_does_not_warn(value):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert field_error("start1", value, ",") != ""
+
+
+@pytest.mark.parametrize(
+    "column, value",
+    [
+        ("chrom1", "chrUn_KI270742v1"),
+        ("chrom1", "chr"),
+        ("chrom2", "chr1234567890"),
+        ("sample", "sample1"),
+        ("sample", "S"),
+    ],
+)
+def test_names_must_have_the_sorted_format(upload, column, value):
+    row = dict(zip(HEADER.strip().split(","), make_rows(1).strip().split(",")))
+    row[column] = value
+    response = upload("names.csv", HEADER + ",".join(row.values()) + "\n")
+    assert response.status_code == 400
+    example = "S3" if column == "sample" else "chr7 or chrX"
+    assert response.json == {
+        "error": f"Row 2 has a {column} that is not like {example}: {value!r}"
+    }
+
+
+def test_names_in_every_sorted_format_are_accepted(upload):
+    rows = "".join(
+        f"{chrom},1,2,{chrom},3,4,S{index},0.5\n"
+        for index, chrom in enumerate(["7", "chr22", "chrx", "chrY", "chrM", "chrMT"])
+    )
+    response = upload("names.csv", HEADER + rows)
+    assert response.status_code == 201, response.json